@@ -13,16 +13,17 @@ from model import (
     CONF,
     Recommender,
     make_dense_profile,
-    infer_outputs,
     infer_bottleneck,
-    rank_by_weighted_score,
+    recommend_top_k,
     compute_holdout_metrics,
     setup_jax_cpu,
+    get_compilation_cache_stats,
 )
 
 # Configure JAX for CPU for local inference
 setup_jax_cpu()
 from normalize_ratings import normalize_ratings
+from weight_bundle import read_weight_bundle
 
 
 class UserAnimeEntry(TypedDict):
@@ -121,19 +122,26 @@ class RecommenderInference:
         self,
         model_path: str = "../data/jax_model.msgpack",
         corpus_ids_path: str = "../data/corpus_ids.json",
+        bundle_path: str | None = None,
     ):
         self.corpus_size = CONF["corpus_size"]
 
-        self._load_corpus_mapping(corpus_ids_path)
-        self._load_model(model_path)
+        if bundle_path is not None:
+            self._load_bundle(bundle_path)
+        else:
+            self._load_corpus_mapping(corpus_ids_path)
+            self._load_model(model_path)
 
     def _load_corpus_mapping(self, corpus_ids_path: str):
         with open(corpus_ids_path, "r") as f:
-            self.corpus_ids = json.load(f)
+            self._set_corpus_ids(json.load(f))
+
+    def _set_corpus_ids(self, corpus_ids: list[int]):
+        self.corpus_ids = corpus_ids
 
         if len(self.corpus_ids) != self.corpus_size:
             raise ValueError(
-                f"corpus_ids.json has {len(self.corpus_ids)} items, expected {self.corpus_size}"
+                f"corpus_ids has {len(self.corpus_ids)} items, expected {self.corpus_size}"
             )
 
         self.anime_id_to_corpus_idx = {
@@ -152,6 +160,13 @@ class RecommenderInference:
         self.params = serialization.from_bytes(params, saved_bytes)
         print(f"Loaded model from {model_path}")
 
+    def _load_bundle(self, bundle_path: str):
+        bundle = read_weight_bundle(bundle_path)
+        self._set_corpus_ids(bundle.corpus_ids)
+        # Aligned views into the mapping are aliased rather than copied on CPU
+        self.params = jax.tree.map(jax.device_put, bundle.params)
+        print(f"Loaded model from bundle {bundle_path}")
+
     def _preprocess_profile(
         self, user_profile: list[UserAnimeEntry]
     ) -> tuple[np.ndarray, np.ndarray, np.ndarray, dict]:
@@ -210,16 +225,10 @@ class RecommenderInference:
             self._preprocess_profile(user_profile)
         )
 
-        input_vector = make_dense_profile(corpus_indices, normalized_ratings)
-
-        item_logits, rating_pred = infer_outputs(self.params, input_vector)
-
-        presence_mask = input_vector[0, : self.corpus_size]
-
-        topk_idx, topk_scores, topk_probs, topk_ratings = rank_by_weighted_score(
-            item_logits[0],
-            rating_pred[0],
-            presence_mask,
+        topk_idx, topk_scores, topk_probs, topk_ratings = recommend_top_k(
+            self.params,
+            corpus_indices,
+            normalized_ratings,
             k=top_k,
             logit_weight=logit_weight,
         )
@@ -317,7 +326,7 @@ class RecommenderInference:
         return anime_id in self.anime_id_to_corpus_idx
 
 
-def main(print_bottleneck: bool = False):
+def main(print_bottleneck: bool = False, bundle_path: str | None = None):
     test_profile: list[UserAnimeEntry] = [
         {"anime_id": 54309, "rating": 9, "watch_status": "completed"},
         {"anime_id": 35557, "rating": 8, "watch_status": "completed"},
@@ -344,7 +353,7 @@ def main(print_bottleneck: bool = False):
     ]
 
     print(f"Initializing recommender...")
-    recommender = RecommenderInference()
+    recommender = RecommenderInference(bundle_path=bundle_path)
 
     print(f"\nTest profile has {len(test_profile)} entries")
 
@@ -394,6 +403,11 @@ def main(print_bottleneck: bool = False):
             for i, v in enumerate(bottleneck_np[-50:], start=len(bottleneck_np) - 50):
                 print(f"    [{i:3d}] {v:12.6f}")
 
+    cache_stats = get_compilation_cache_stats()
+    print(
+        f"\nCompilation cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses"
+    )
+
     print(f"\nNormalization stats: {result.normalization_stats}")
 
     print("\n" + "=" * 60)
@@ -444,6 +458,12 @@ if __name__ == "__main__":
         action="store_true",
         help="Print raw bottleneck layer activations for analysis",
     )
+    parser.add_argument(
+        "--bundle-path",
+        type=str,
+        default=None,
+        help="Load the model from a weight bundle instead of the msgpack checkpoint",
+    )
     args = parser.parse_args()
 
-    main(print_bottleneck=args.bottleneck)
+    main(print_bottleneck=args.bottleneck, bundle_path=args.bundle_path)
@@ -1,4 +1,5 @@
 import os
+from functools import partial
 import numpy as np
 import jax
 import jax.numpy as jnp
@@ -20,18 +21,72 @@ CONF = {
 }
 
 
-def setup_jax_cpu(num_devices: int | None = None):
+# Persistent compilation cache lookups since `setup_compilation_cache` was called
+_compilation_cache_stats = {"hits": 0, "misses": 0}
+_compilation_cache_listener_registered = False
+
+
+def _on_jax_monitoring_event(event: str, **kwargs) -> None:
+    if event == "/jax/compilation_cache/cache_hits":
+        _compilation_cache_stats["hits"] += 1
+    elif event == "/jax/compilation_cache/cache_misses":
+        _compilation_cache_stats["misses"] += 1
+
+
+def setup_compilation_cache(cache_dir: str | None = None):
+    """
+    Enable JAX's persistent on-disk compilation cache so that compiled programs are
+    reused across process restarts.
+
+    If `cache_dir` is None, the `COMPILATION_CACHE_DIR` environment variable is used.
+    If neither is set, the cache stays disabled.
+    """
+    global _compilation_cache_listener_registered
+
+    if cache_dir is None:
+        cache_dir = os.environ.get("COMPILATION_CACHE_DIR")
+    if not cache_dir:
+        return
+
+    os.makedirs(cache_dir, exist_ok=True)
+    jax.config.update("jax_compilation_cache_dir", cache_dir)
+    # Cache every program rather than only ones that take over a second to compile;
+    # the many small ranking/metrics kernels add up
+    jax.config.update("jax_persistent_cache_min_compile_time_secs", 0)
+
+    if not _compilation_cache_listener_registered:
+        jax.monitoring.register_event_listener(_on_jax_monitoring_event)
+        _compilation_cache_listener_registered = True
+
+    print(f"[model.py] Using persistent compilation cache at {cache_dir}")
+
+
+def get_compilation_cache_stats() -> dict[str, int]:
+    """Return the number of persistent compilation cache hits and misses so far."""
+    return dict(_compilation_cache_stats)
+
+
+def setup_jax_cpu(
+    num_devices: int | None = None, compilation_cache_dir: str | None = None
+):
     """
     Configure JAX for CPU parallelism.
     Must be called before any other JAX operations (like loading the model).
+
+    Also enables the persistent compilation cache if `compilation_cache_dir` or the
+    `COMPILATION_CACHE_DIR` environment variable is set (see `setup_compilation_cache`).
     """
     # Ensure we're using CPU backend
     jax.config.update("jax_platform_name", "cpu")
 
     if num_devices is None:
-        # Default to all available CPUs
-        # os.cpu_count() returns None if undetermined
-        num_devices = os.cpu_count() or 1
+        # Default to all CPUs this process may run on, which respects any affinity
+        # mask (e.g. multi-worker server processes pinned to a slice of cores)
+        if hasattr(os, "sched_getaffinity"):
+            num_devices = len(os.sched_getaffinity(0))
+        else:
+            # os.cpu_count() returns None if undetermined
+            num_devices = os.cpu_count() or 1
 
     # Ensure at least 1 device
     num_devices = max(1, num_devices)
@@ -39,14 +94,29 @@ def setup_jax_cpu(num_devices: int | None = None):
     jax.config.update("jax_num_cpu_devices", num_devices)
     print(f"[model.py] Configured JAX with {num_devices} CPU devices")
 
+    setup_compilation_cache(compilation_cache_dir)
 
-def get_sharding_mesh() -> Mesh:
-    """Get a mesh for data parallelism across all available devices."""
-    devices = jax.devices()
+
+def get_sharding_mesh(devices: list | None = None) -> Mesh:
+    """Get a mesh for data parallelism across `devices` (default: all available devices)."""
+    if devices is None:
+        devices = jax.devices()
     # Create a mesh where 'batch' dimension maps to all devices
     return Mesh(np.array(devices), axis_names=("batch",))
 
 
+def partition_devices(num_partitions: int) -> list[list]:
+    """Split the available devices into `num_partitions` contiguous, equally sized groups."""
+    devices = jax.devices()
+    if num_partitions > len(devices):
+        raise ValueError(
+            f"Cannot split {len(devices)} devices into {num_partitions} partitions"
+        )
+    return [
+        list(group) for group in np.array_split(np.array(devices), num_partitions)
+    ]
+
+
 def get_num_cpu_devices() -> int:
     """Return the number of CPU devices configured."""
     return jax.device_count()
@@ -160,6 +230,200 @@ def sharded_batch_infer_outputs(params, x):
     return batch_infer_outputs(params, x)
 
 
+def _dense(layer_params, x):
+    return jnp.dot(x, layer_params["kernel"]) + layer_params["bias"]
+
+
+def _decode_from_dense_0_preactivation(params, h):
+    """
+    Run the rest of the network starting from the `Dense_0` pre-activation.
+
+    Mirrors `Recommender.__call__` with `training=False`.
+    """
+    h = jax.nn.swish(h)
+    z = _dense(params["bottleneck"], h)
+
+    d1 = jax.nn.swish(_dense(params["dec_item_up1"], z))
+    d1 = jax.nn.swish(_dense(params["dec_item_up2"], d1))
+    item_logits = _dense(params["item_logits"], d1)
+
+    d2 = jax.nn.swish(_dense(params["dec_rating_up1"], z))
+    d2 = jax.nn.swish(_dense(params["dec_rating_up2"], d2))
+    rating_pred = _dense(params["rating_pred"], d2)
+
+    return item_logits, rating_pred
+
+
+# Smallest padded length for sparse profiles.  Profiles are padded up to the next power
+# of two so that distinct profile lengths share a small number of compiled shapes.
+_MIN_SPARSE_PROFILE_LENGTH = 32
+# Most gathered `Dense_0` kernel elements held at once by `_sparse_dense_0_preactivation`
+_SPARSE_GATHER_MAX_ELEMENTS = 1 << 22
+
+
+def sparse_profile_pad_length(n_items: int) -> int:
+    """Return the padded length used for a sparse profile with `n_items` entries."""
+    length = _MIN_SPARSE_PROFILE_LENGTH
+    while length < n_items:
+        length *= 2
+    return length
+
+
+def pad_sparse_profiles(
+    profiles: list[tuple[np.ndarray, np.ndarray]],
+    pad_to_length: int | None = None,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Stack sparse profiles into padded index/value arrays.
+
+    Args:
+        profiles: List of (idxs, vals) tuples, one per profile
+        pad_to_length: Length to pad every profile to.  If None, uses
+                       `sparse_profile_pad_length` of the longest profile.
+
+    Returns:
+        - idxs: (n_profiles, pad_to_length) int32 corpus indices, padded with -1
+        - vals: (n_profiles, pad_to_length) float32 normalized ratings, padded with 0
+    """
+    if pad_to_length is None:
+        max_len = max((len(idxs) for idxs, _ in profiles), default=0)
+        pad_to_length = sparse_profile_pad_length(max_len)
+
+    padded_idxs = np.full((len(profiles), pad_to_length), -1, dtype=np.int32)
+    padded_vals = np.zeros((len(profiles), pad_to_length), dtype=np.float32)
+    for i, (idxs, vals) in enumerate(profiles):
+        padded_idxs[i, : len(idxs)] = idxs
+        padded_vals[i, : len(vals)] = vals
+
+    return padded_idxs, padded_vals
+
+
+def _sparse_dense_0_preactivation(params, idxs, vals):
+    """
+    Compute the `Dense_0` pre-activation for padded sparse profiles.
+
+    Equivalent to `x @ kernel + bias` for the dense input built by `make_dense_profile`,
+    but computed as a weighted sum of gathered kernel rows (embedding-bag style) so the
+    cost scales with profile length rather than corpus size.
+
+    Args:
+        params: Model parameters
+        idxs: (batch_size, max_len) corpus indices, padded with -1
+        vals: (batch_size, max_len) normalized ratings
+    """
+    kernel = params["Dense_0"]["kernel"]
+    corpus_size = kernel.shape[0] // 2
+
+    present = idxs >= 0
+    safe_idxs = jnp.where(present, idxs, 0)
+    presence_weights = present.astype(kernel.dtype)
+    rating_weights = jnp.where(present, vals, 0.0).astype(kernel.dtype)
+
+    # Each profile entry contributes its presence row and its rating row
+    rows = jnp.concatenate([safe_idxs, corpus_size + safe_idxs], axis=1)
+    weights = jnp.concatenate([presence_weights, rating_weights], axis=1)
+
+    # The gathered rows are materialized before being reduced, so long padded batches
+    # are reduced a bounded chunk of rows at a time
+    batch_size, num_rows = rows.shape
+    hidden_size = kernel.shape[1]
+    chunk_rows = max(1, _SPARSE_GATHER_MAX_ELEMENTS // (batch_size * hidden_size))
+    if num_rows <= chunk_rows:
+        h = jnp.einsum("bl,blh->bh", weights, kernel[rows])
+    else:
+        num_chunks = -(-num_rows // chunk_rows)
+        # Padding rows have zero weight
+        padding = ((0, 0), (0, num_chunks * chunk_rows - num_rows))
+        rows = jnp.pad(rows, padding).reshape(batch_size, num_chunks, chunk_rows)
+        weights = jnp.pad(weights, padding).reshape(batch_size, num_chunks, chunk_rows)
+
+        def add_chunk(h, chunk):
+            chunk_rows, chunk_weights = chunk
+            return h + jnp.einsum("bl,blh->bh", chunk_weights, kernel[chunk_rows]), None
+
+        h, _ = jax.lax.scan(
+            add_chunk,
+            jnp.zeros((batch_size, hidden_size), kernel.dtype),
+            (rows.transpose(1, 0, 2), weights.transpose(1, 0, 2)),
+        )
+
+    return h + params["Dense_0"]["bias"]
+
+
+@jax.jit
+def batch_infer_outputs_sparse(params, idxs, vals):
+    """
+    Run inference on a batch of padded sparse profiles.
+
+    Args:
+        params: Model parameters
+        idxs: (batch_size, max_len) corpus indices, padded with -1
+        vals: (batch_size, max_len) normalized ratings, padded with 0
+
+    Returns:
+        tuple of (item_logits, rating_pred) each of shape (batch_size, corpus_size)
+    """
+    h = _sparse_dense_0_preactivation(params, idxs, vals)
+    return _decode_from_dense_0_preactivation(params, h)
+
+
+def infer_outputs_sparse(
+    params, idxs: np.ndarray, vals: np.ndarray
+) -> tuple[jnp.ndarray, jnp.ndarray]:
+    """
+    Run inference on a single sparse profile.
+
+    Numerically equivalent to `infer_outputs(params, make_dense_profile(idxs, vals))`
+    without building the dense input vector.
+
+    Args:
+        params: Model parameters
+        idxs: Array of corpus indices for items the user has rated
+        vals: Array of normalized rating values corresponding to idxs
+
+    Returns:
+        tuple of (item_logits, rating_pred) each of shape (1, corpus_size)
+    """
+    padded_idxs, padded_vals = pad_sparse_profiles([(idxs, vals)])
+    return batch_infer_outputs_sparse(params, padded_idxs, padded_vals)
+
+
+@jax.jit
+def holdout_infer_outputs(
+    params, profile_idxs, profile_vals, held_out_idxs, held_out_vals
+):
+    """
+    Run inference for a batch of single-item holdouts of one profile.
+
+    Each holdout input differs from the full profile by exactly one presence entry
+    and one rating entry, so rather than running the full `Dense_0` matmul for every
+    row, the full-profile pre-activation is computed once and each holdout's
+    pre-activation is derived by subtracting the held-out item's two kernel rows.
+
+    Args:
+        params: Model parameters
+        profile_idxs: Full-profile corpus indices, shape (max_len,), padded with -1
+        profile_vals: Full-profile normalized ratings, shape (max_len,), padded with 0
+        held_out_idxs: Corpus indices of the held-out items, shape (batch_size,)
+        held_out_vals: Normalized ratings of the held-out items, shape (batch_size,)
+
+    Returns:
+        tuple of (item_logits, rating_pred) each of shape (batch_size, corpus_size)
+    """
+    kernel = params["Dense_0"]["kernel"]
+    corpus_size = kernel.shape[0] // 2
+
+    h_full = _sparse_dense_0_preactivation(
+        params, profile_idxs[None, :], profile_vals[None, :]
+    )
+    h = (
+        h_full
+        - kernel[held_out_idxs]
+        - held_out_vals[:, None] * kernel[corpus_size + held_out_idxs]
+    )
+    return _decode_from_dense_0_preactivation(params, h)
+
+
 @jax.jit
 def infer_bottleneck(params, x):
     h = jnp.dot(x, params["Dense_0"]["kernel"]) + params["Dense_0"]["bias"]
@@ -239,6 +503,102 @@ def compute_recommendation_ranking_score_alt(
     return combined_score, item_probs
 
 
+def niche_boost_multiplier(
+    item_probs: jnp.ndarray,
+    popularity: jnp.ndarray,
+    niche_boost: float | jnp.ndarray,
+) -> jnp.ndarray:
+    """
+    Score multiplier rewarding items the model predicts more strongly than their global
+    popularity would suggest.
+
+    Args:
+        item_probs: Predicted presence probabilities (any shape)
+        popularity: Normalized popularity of the same items
+        niche_boost: Boost strength; 0 gives a multiplier of exactly 1
+
+    Returns:
+        1 + niche_boost * log(1 + item_probs / popularity), which is >= 1
+    """
+    # Epsilon avoids division by zero for items without popularity data
+    surprise_ratio = item_probs / (popularity + 1e-9)
+    # log compresses the range, since the ratio can be very large for niche items
+    return 1.0 + niche_boost * jnp.log1p(surprise_ratio)
+
+
+def keep_best_per_franchise(
+    scores: jnp.ndarray, franchise_ids: jnp.ndarray
+) -> jnp.ndarray:
+    """
+    Mask out every item except the best-scoring one of each franchise.
+
+    Args:
+        scores: (corpus_size,) scores, with -inf for items that can't be recommended
+        franchise_ids: (corpus_size,) franchise of each item, in [0, corpus_size), or -1
+                       for items that are ranked on their own
+
+    Returns:
+        `scores` with the other members of each franchise set to -inf.  Ties go to the
+        lowest index.
+    """
+    num_items = scores.shape[0]
+    # Items without a franchise all go in an extra segment that is never collapsed
+    segments = jnp.where(franchise_ids >= 0, franchise_ids, num_items)
+    best_scores = jax.ops.segment_max(scores, segments, num_segments=num_items + 1)
+    item_idx = jnp.arange(num_items)
+    best_idx = jax.ops.segment_min(
+        jnp.where(scores >= best_scores[segments], item_idx, num_items),
+        segments,
+        num_segments=num_items + 1,
+    )
+    keep = (franchise_ids < 0) | (item_idx == best_idx[segments])
+    return jnp.where(keep, scores, -jnp.inf)
+
+
+def _select_top_k(
+    item_logits_1d: jnp.ndarray,
+    preds_1d: jnp.ndarray,
+    already_rated_mask_1d: jnp.ndarray,
+    k: int,
+    logit_weight: float,
+    use_alt_ranking: bool,
+    popularity: jnp.ndarray | None = None,
+    niche_boost: float | jnp.ndarray = 0.0,
+    franchise_ids: jnp.ndarray | None = None,
+    collapse_franchises: bool | jnp.ndarray = False,
+) -> tuple[jnp.ndarray, jnp.ndarray, jnp.ndarray, jnp.ndarray]:
+    ranking_fn = (
+        compute_recommendation_ranking_score_alt
+        if use_alt_ranking
+        else compute_recommendation_ranking_score
+    )
+    combined_score, item_probs = ranking_fn(item_logits_1d, preds_1d, logit_weight)
+    if popularity is not None:
+        combined_score = combined_score * niche_boost_multiplier(
+            item_probs, popularity, niche_boost
+        )
+
+    masked = jnp.where(already_rated_mask_1d > 0, -jnp.inf, combined_score)
+    if franchise_ids is not None:
+        masked = jax.lax.cond(
+            collapse_franchises,
+            lambda scores: keep_best_per_franchise(scores, franchise_ids),
+            lambda scores: scores,
+            masked,
+        )
+    _, topk_idx = jax.lax.top_k(masked, k)
+
+    return (
+        topk_idx,
+        combined_score[topk_idx],
+        item_probs[topk_idx],
+        preds_1d[topk_idx],
+    )
+
+
+_jitted_select_top_k = jax.jit(_select_top_k, static_argnames=("k", "use_alt_ranking"))
+
+
 def rank_by_weighted_score(
     item_logits_1d: jnp.ndarray,
     preds_1d: jnp.ndarray,
@@ -246,6 +606,10 @@ def rank_by_weighted_score(
     k: int = 50,
     logit_weight: float | None = None,
     use_alt_ranking: bool = False,
+    popularity: jnp.ndarray | None = None,
+    niche_boost: float = 0.0,
+    franchise_ids: jnp.ndarray | None = None,
+    collapse_franchises: bool = False,
 ) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
     """
     Rank items using weighted combination of presence probability and rating.
@@ -256,30 +620,235 @@ def rank_by_weighted_score(
         already_rated_mask_1d: Binary mask indicating already-rated items (1 = rated)
         k: Number of top items to return
         logit_weight: Weight for probability in the combined score
+        use_alt_ranking: Use `compute_recommendation_ranking_score_alt` for scoring
+        popularity: Optional (corpus_size,) popularity distribution.  If given, scores
+                    are multiplied by `niche_boost_multiplier` before selecting the top k.
+        niche_boost: Niche boost strength
+        franchise_ids: Optional (corpus_size,) franchise of each item, -1 for none
+        collapse_franchises: Only return the best-scoring item of each franchise (see
+                             `keep_best_per_franchise`)
 
     Returns:
         tuple of (topk_indices, topk_scores, topk_probs, topk_ratings)
     """
-    ranking_fn = (
-        compute_recommendation_ranking_score_alt
-        if use_alt_ranking
-        else compute_recommendation_ranking_score
+    if logit_weight is None:
+        logit_weight = CONF["rec_logit_weight"]
+
+    return jax.device_get(
+        _jitted_select_top_k(
+            item_logits_1d,
+            preds_1d,
+            already_rated_mask_1d,
+            k=min(k, item_logits_1d.shape[0]),
+            logit_weight=logit_weight,
+            use_alt_ranking=use_alt_ranking,
+            popularity=popularity,
+            niche_boost=niche_boost,
+            franchise_ids=franchise_ids,
+            collapse_franchises=collapse_franchises,
+        )
     )
-    combined_score, item_probs = ranking_fn(
-        item_logits_1d, preds_1d, logit_weight
+
+
+def _batch_select_top_k(
+    item_logits: jnp.ndarray,
+    rating_pred: jnp.ndarray,
+    idxs: jnp.ndarray,
+    logit_weight: float | jnp.ndarray,
+    k: int,
+    use_alt_ranking: bool,
+    popularity: jnp.ndarray | None = None,
+    niche_boost: float | jnp.ndarray = 0.0,
+    excluded_bits: jnp.ndarray | None = None,
+    franchise_ids: jnp.ndarray | None = None,
+    collapse_franchises: bool | jnp.ndarray = False,
+) -> tuple[jnp.ndarray, jnp.ndarray, jnp.ndarray, jnp.ndarray]:
+    present = idxs >= 0
+    rows = jnp.arange(idxs.shape[0])[:, None]
+    already_rated_mask = (
+        jnp.zeros(item_logits.shape, dtype=jnp.float32)
+        .at[rows, jnp.where(present, idxs, 0)]
+        .max(present.astype(jnp.float32))
     )
+    if excluded_bits is not None:
+        excluded = jnp.unpackbits(excluded_bits, axis=-1, count=item_logits.shape[-1])
+        already_rated_mask = jnp.maximum(
+            already_rated_mask, excluded.astype(jnp.float32)
+        )
 
-    masked = jnp.where(already_rated_mask_1d > 0, -jnp.inf, combined_score)
-    topk_idx = jnp.argsort(masked)[-k:][::-1]
+    logit_weights = jnp.broadcast_to(
+        jnp.asarray(logit_weight, dtype=jnp.float32), (idxs.shape[0],)
+    )
+    niche_boosts = jnp.broadcast_to(
+        jnp.asarray(niche_boost, dtype=jnp.float32), (idxs.shape[0],)
+    )
+    collapse = jnp.broadcast_to(
+        jnp.asarray(collapse_franchises, dtype=bool), (idxs.shape[0],)
+    )
 
-    return (
-        np.array(topk_idx),
-        np.array(combined_score[topk_idx]),
-        np.array(item_probs[topk_idx]),
-        np.array(preds_1d[topk_idx]),
+    def select(franchise_ids):
+        return jax.vmap(
+            lambda logits_1d, preds_1d, mask_1d, weight, boost, collapse_row: (
+                _select_top_k(
+                    logits_1d,
+                    preds_1d,
+                    mask_1d,
+                    k,
+                    weight,
+                    use_alt_ranking,
+                    popularity,
+                    boost,
+                    franchise_ids,
+                    collapse_row,
+                )
+            )
+        )(
+            item_logits,
+            rating_pred,
+            already_rated_mask,
+            logit_weights,
+            niche_boosts,
+            collapse,
+        )
+
+    if franchise_ids is None:
+        return select(None)
+    # Under vmap the per-row condition computes both branches, so skip collapsing
+    # entirely for batches where no profile asked for it
+    return jax.lax.cond(
+        jnp.any(collapse), select, lambda _: select(None), franchise_ids
     )
 
 
+@partial(jax.jit, static_argnames=("k", "use_alt_ranking"))
+def batch_rank_top_k(
+    item_logits: jnp.ndarray,
+    rating_pred: jnp.ndarray,
+    idxs: jnp.ndarray,
+    logit_weight: float | jnp.ndarray,
+    k: int,
+    use_alt_ranking: bool = False,
+    popularity: jnp.ndarray | None = None,
+    niche_boost: float | jnp.ndarray = 0.0,
+    excluded_bits: jnp.ndarray | None = None,
+    franchise_ids: jnp.ndarray | None = None,
+    collapse_franchises: bool | jnp.ndarray = False,
+) -> tuple[jnp.ndarray, jnp.ndarray, jnp.ndarray, jnp.ndarray]:
+    """
+    Run scoring, rated-item masking and top-k selection on already computed model outputs.
+
+    Args:
+        item_logits: (batch_size, corpus_size) presence logits
+        rating_pred: (batch_size, corpus_size) predicted ratings
+        idxs: (batch_size, max_len) corpus indices of each profile, padded with -1
+        logit_weight: Weight for probability in the combined score, either a scalar shared
+                      by all profiles or a (batch_size,) array with one weight per profile
+        k: Number of top items to return per profile
+        use_alt_ranking: Use `compute_recommendation_ranking_score_alt` for scoring
+        popularity: Optional (corpus_size,) popularity distribution to niche boost with
+                    (see `niche_boost_multiplier`)
+        niche_boost: Niche boost strength, either a scalar or a (batch_size,) array
+        excluded_bits: Optional (batch_size, ceil(corpus_size / 8)) uint8 array of items
+                       to mask out in addition to each profile's own, packed with
+                       `np.packbits`
+        franchise_ids: Optional (corpus_size,) franchise of each item, -1 for none
+        collapse_franchises: Only return the best-scoring item of each franchise (see
+                             `keep_best_per_franchise`), either a scalar or a
+                             (batch_size,) bool array
+
+    Returns:
+        tuple of (topk_indices, topk_scores, topk_probs, topk_ratings), each of
+        shape (batch_size, k)
+    """
+    return _batch_select_top_k(
+        item_logits,
+        rating_pred,
+        idxs,
+        logit_weight,
+        k,
+        use_alt_ranking,
+        popularity,
+        niche_boost,
+        excluded_bits,
+        franchise_ids,
+        collapse_franchises,
+    )
+
+
+@partial(jax.jit, static_argnames=("k", "use_alt_ranking"))
+def batch_recommend_top_k(
+    params,
+    idxs: jnp.ndarray,
+    vals: jnp.ndarray,
+    logit_weight: float | jnp.ndarray,
+    k: int,
+    use_alt_ranking: bool = False,
+) -> tuple[jnp.ndarray, jnp.ndarray, jnp.ndarray, jnp.ndarray]:
+    """
+    Run inference, scoring, rated-item masking and top-k selection for a batch of profiles.
+
+    Args:
+        params: Model parameters
+        idxs: (batch_size, max_len) corpus indices, padded with -1
+        vals: (batch_size, max_len) normalized ratings, padded with 0
+        logit_weight: Weight for probability in the combined score, either a scalar shared
+                      by all profiles or a (batch_size,) array with one weight per profile
+        k: Number of top items to return per profile
+        use_alt_ranking: Use `compute_recommendation_ranking_score_alt` for scoring
+
+    Returns:
+        tuple of (topk_indices, topk_scores, topk_probs, topk_ratings), each of
+        shape (batch_size, k)
+    """
+    item_logits, rating_pred = batch_infer_outputs_sparse(params, idxs, vals)
+    return _batch_select_top_k(
+        item_logits, rating_pred, idxs, logit_weight, k, use_alt_ranking
+    )
+
+
+def recommend_top_k(
+    params,
+    idxs: np.ndarray,
+    vals: np.ndarray,
+    k: int = 50,
+    logit_weight: float | None = None,
+    use_alt_ranking: bool = False,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Get the top-k recommendations for a single sparse profile.
+
+    Equivalent to running `infer_outputs_sparse` followed by `rank_by_weighted_score` with
+    the profile's items masked out, but fused into one compiled function so that only the
+    k selected items are transferred back to the host.
+
+    Args:
+        params: Model parameters
+        idxs: Array of corpus indices for items the user has rated
+        vals: Array of normalized rating values corresponding to idxs
+        k: Number of top items to return
+        logit_weight: Weight for probability in the combined score
+        use_alt_ranking: Use `compute_recommendation_ranking_score_alt` for scoring
+
+    Returns:
+        tuple of (topk_indices, topk_scores, topk_probs, topk_ratings)
+    """
+    if logit_weight is None:
+        logit_weight = CONF["rec_logit_weight"]
+
+    padded_idxs, padded_vals = pad_sparse_profiles([(idxs, vals)])
+    topk_idx, topk_scores, topk_probs, topk_ratings = jax.device_get(
+        batch_recommend_top_k(
+            params,
+            padded_idxs,
+            padded_vals,
+            logit_weight,
+            k=min(k, CONF["corpus_size"]),
+            use_alt_ranking=use_alt_ranking,
+        )
+    )
+    return topk_idx[0], topk_scores[0], topk_probs[0], topk_ratings[0]
+
+
 def create_holdout_batch(
     idxs: np.ndarray,
     vals: np.ndarray,
@@ -335,6 +904,41 @@ def create_holdout_batch(
     )
 
 
+def create_holdout_downdates(
+    idxs: np.ndarray,
+    vals: np.ndarray,
+    pad_to_size: int | None = None,
+) -> tuple[jnp.ndarray, jnp.ndarray, int]:
+    """
+    Create the held-out items for a batch where each row holds out one item from the profile.
+
+    This is the input for `holdout_infer_outputs`, which avoids materializing the dense
+    holdout batch built by `create_holdout_batch`.
+
+    Args:
+        idxs: Array of corpus indices for items the user has rated
+        vals: Array of normalized rating values
+        pad_to_size: If provided, pads the batch to this size.
+                     Otherwise, size will be exactly len(idxs).
+
+    Returns:
+        - held_out_indices: (actual_size or pad_to_size,)
+        - held_out_ratings: (actual_size or pad_to_size,)
+        - actual_size: int - the number of items held out
+    """
+    actual_size = len(idxs)
+    batch_size = pad_to_size if pad_to_size is not None else actual_size
+    actual_size = min(actual_size, batch_size)
+
+    # Padding rows hold out corpus item 0 with a rating of 0; their outputs are discarded
+    held_out_indices = np.zeros(batch_size, dtype=np.int32)
+    held_out_ratings = np.zeros(batch_size, dtype=np.float32)
+    held_out_indices[:actual_size] = idxs[:actual_size]
+    held_out_ratings[:actual_size] = vals[:actual_size]
+
+    return jnp.array(held_out_indices), jnp.array(held_out_ratings), actual_size
+
+
 # Fixed batch size for GPU holdout prediction to avoid JIT recompilation.
 # On GPU, recompiling for every unique batch size is extremely slow.
 _GPU_HOLDOUT_BATCH_SIZE = 256
@@ -345,6 +949,7 @@ def _batch_holdout_predict_gpu(
     idxs: np.ndarray,
     vals: np.ndarray,
     corpus_size: int,
+    downdate: bool = True,
 ) -> tuple[jnp.ndarray, jnp.ndarray]:
     """
     GPU-optimized holdout prediction.
@@ -352,14 +957,23 @@ def _batch_holdout_predict_gpu(
     Uses a fixed batch size to avoid JIT recompilation overhead.
     GPU recompilation is very expensive, so we process in fixed-size
     chunks to ensure the JIT-compiled function is reused.
+
+    Returns outputs padded to a multiple of the batch size.
     """
     n_items = len(idxs)
     batch_size = _GPU_HOLDOUT_BATCH_SIZE
 
-    # Create the full holdout batch (unpadded)
-    full_input_batch, _, _, _ = create_holdout_batch(
-        idxs, vals, corpus_size, pad_to_size=None
-    )
+    if downdate:
+        (profile_idxs,), (profile_vals,) = pad_sparse_profiles([(idxs, vals)])
+        n_chunks = (n_items + batch_size - 1) // batch_size
+        held_out_indices, held_out_ratings, _ = create_holdout_downdates(
+            idxs, vals, pad_to_size=n_chunks * batch_size
+        )
+    else:
+        # Create the full holdout batch (unpadded)
+        full_input_batch, _, _, _ = create_holdout_batch(
+            idxs, vals, corpus_size, pad_to_size=None
+        )
 
     # Process in fixed-size chunks
     all_item_logits = []
@@ -369,60 +983,201 @@ def _batch_holdout_predict_gpu(
         end_idx = min(start_idx + batch_size, n_items)
         chunk_size = end_idx - start_idx
 
-        # Pad chunk to fixed batch size if needed
-        if chunk_size < batch_size:
-            padded_chunk = jnp.zeros((batch_size, corpus_size * 2), dtype=jnp.float32)
-            padded_chunk = padded_chunk.at[:chunk_size].set(
-                full_input_batch[start_idx:end_idx]
+        if downdate:
+            # Held-out items were already padded to a multiple of the batch size
+            item_logits, rating_pred = holdout_infer_outputs(
+                params,
+                profile_idxs,
+                profile_vals,
+                held_out_indices[start_idx : start_idx + batch_size],
+                held_out_ratings[start_idx : start_idx + batch_size],
             )
         else:
-            padded_chunk = full_input_batch[start_idx:end_idx]
-
-        item_logits, rating_pred = batch_infer_outputs(params, padded_chunk)
-
-        # Only keep the actual results (not padding)
-        all_item_logits.append(item_logits[:chunk_size])
-        all_rating_pred.append(rating_pred[:chunk_size])
+            # Pad chunk to fixed batch size if needed
+            if chunk_size < batch_size:
+                padded_chunk = jnp.zeros(
+                    (batch_size, corpus_size * 2), dtype=jnp.float32
+                )
+                padded_chunk = padded_chunk.at[:chunk_size].set(
+                    full_input_batch[start_idx:end_idx]
+                )
+            else:
+                padded_chunk = full_input_batch[start_idx:end_idx]
+
+            item_logits, rating_pred = batch_infer_outputs(params, padded_chunk)
+
+        # Only the last chunk contains padding, so the concatenated rows stay aligned
+        # with the profile
+        all_item_logits.append(item_logits)
+        all_rating_pred.append(rating_pred)
 
     return jnp.concatenate(all_item_logits, axis=0), jnp.concatenate(
         all_rating_pred, axis=0
     )
 
 
+# Holdout batch sizes for CPU prediction.  Batches are padded up to the smallest bucket
+# that fits (rounded up to a multiple of the device count) so that profiles of different
+# lengths reuse the same compiled programs; batches larger than the last bucket are
+# processed in chunks of that size.
+_CPU_HOLDOUT_BUCKET_SIZES = (8, 16, 32, 64, 128, 256, 512, 1024)
+
+# bucket size -> {"calls": int, "compiles": int}
+_holdout_bucket_stats: dict[int, dict[str, int]] = {}
+_seen_holdout_shapes: set[tuple] = set()
+
+
+def get_holdout_bucket_size(n_items: int, num_devices: int = 1) -> int:
+    """Return the padded batch size used for a CPU holdout batch of `n_items` rows."""
+    bucket_size = next(
+        (size for size in _CPU_HOLDOUT_BUCKET_SIZES if size >= n_items),
+        _CPU_HOLDOUT_BUCKET_SIZES[-1],
+    )
+    return ((bucket_size + num_devices - 1) // num_devices) * num_devices
+
+
+def get_holdout_bucket_sizes(n_items: int, num_devices: int = 1) -> list[int]:
+    """Return the padded size of each chunk a CPU holdout batch of `n_items` rows is run as."""
+    max_chunk_size = get_holdout_bucket_size(_CPU_HOLDOUT_BUCKET_SIZES[-1], num_devices)
+    return [
+        get_holdout_bucket_size(min(max_chunk_size, n_items - start_idx), num_devices)
+        for start_idx in range(0, n_items, max_chunk_size)
+    ]
+
+
+def _record_holdout_bucket(bucket_size: int, shape_key: tuple) -> None:
+    stats = _holdout_bucket_stats.setdefault(bucket_size, {"calls": 0, "compiles": 0})
+    stats["calls"] += 1
+    if shape_key not in _seen_holdout_shapes:
+        _seen_holdout_shapes.add(shape_key)
+        stats["compiles"] += 1
+
+
+def get_holdout_bucket_stats() -> dict[int, dict[str, int]]:
+    """
+    Return per-bucket usage counters for CPU holdout prediction.
+
+    `compiles` counts the distinct input shapes seen for each bucket, each of which
+    costs one XLA compilation the first time it is used.
+    """
+    return {
+        bucket_size: dict(stats)
+        for bucket_size, stats in sorted(_holdout_bucket_stats.items())
+    }
+
+
 def _batch_holdout_predict_cpu(
     params,
     idxs: np.ndarray,
     vals: np.ndarray,
     corpus_size: int,
+    downdate: bool = True,
+    mesh: Mesh | None = None,
 ) -> tuple[jnp.ndarray, jnp.ndarray]:
     """
     CPU-optimized holdout prediction.
 
-    Parallelizes across available CPU devices. Pads to multiples of device
-    count for efficient sharding. CPU JIT compilation is faster, so we
-    can be more flexible with batch sizes.
+    Parallelizes across the devices of `mesh` (default: all available CPU devices), which
+    `params` must be replicated on.  Batches are padded to a fixed ladder of bucket sizes
+    (see `get_holdout_bucket_size`) so that new profile lengths don't trigger a recompile
+    of the model.
+
+    Returns outputs padded to the bucket size.
     """
-    num_devices = get_num_cpu_devices()
+    if mesh is None:
+        mesh = get_sharding_mesh()
+    num_devices = mesh.size
     n_items = len(idxs)
-
-    # Pad to multiple of num_devices for efficient sharding
-    padded_batch_size = ((n_items + num_devices - 1) // num_devices) * num_devices
-
-    input_batch, _, _, _ = create_holdout_batch(
-        idxs, vals, corpus_size, pad_to_size=padded_batch_size
-    )
+    max_chunk_size = get_holdout_bucket_size(_CPU_HOLDOUT_BUCKET_SIZES[-1], num_devices)
 
     if num_devices > 1:
-        mesh = get_sharding_mesh()
+        batch_sharding = NamedSharding(mesh, P("batch"))
         input_sharding = NamedSharding(mesh, P("batch", None))
-        sharded_input = jax.device_put(input_batch, input_sharding)
 
-        item_logits, rating_pred = sharded_batch_infer_outputs(params, sharded_input)
+    if downdate:
+        (profile_idxs,), (profile_vals,) = pad_sparse_profiles([(idxs, vals)])
     else:
-        item_logits, rating_pred = batch_infer_outputs(params, input_batch)
+        full_input_batch, _, _, _ = create_holdout_batch(
+            idxs, vals, corpus_size, pad_to_size=None
+        )
 
-    # Return only the actual items (remove padding)
-    return item_logits[:n_items], rating_pred[:n_items]
+    all_item_logits = []
+    all_rating_pred = []
+
+    for start_idx in range(0, n_items, max_chunk_size):
+        end_idx = min(start_idx + max_chunk_size, n_items)
+        chunk_size = end_idx - start_idx
+        bucket_size = get_holdout_bucket_size(chunk_size, num_devices)
+
+        if downdate:
+            _record_holdout_bucket(
+                bucket_size, ("downdate", bucket_size, len(profile_idxs))
+            )
+            held_out_indices, held_out_ratings, _ = create_holdout_downdates(
+                idxs[start_idx:end_idx],
+                vals[start_idx:end_idx],
+                pad_to_size=bucket_size,
+            )
+
+            if num_devices > 1:
+                held_out_indices = jax.device_put(held_out_indices, batch_sharding)
+                held_out_ratings = jax.device_put(held_out_ratings, batch_sharding)
+
+            item_logits, rating_pred = holdout_infer_outputs(
+                params, profile_idxs, profile_vals, held_out_indices, held_out_ratings
+            )
+        else:
+            _record_holdout_bucket(bucket_size, ("dense", bucket_size))
+            input_batch = jnp.zeros((bucket_size, corpus_size * 2), dtype=jnp.float32)
+            input_batch = input_batch.at[:chunk_size].set(
+                full_input_batch[start_idx:end_idx]
+            )
+
+            if num_devices > 1:
+                sharded_input = jax.device_put(input_batch, input_sharding)
+                item_logits, rating_pred = sharded_batch_infer_outputs(
+                    params, sharded_input
+                )
+            else:
+                item_logits, rating_pred = batch_infer_outputs(params, input_batch)
+
+        # Only the last chunk contains padding, so the concatenated rows stay aligned
+        # with the profile
+        all_item_logits.append(item_logits)
+        all_rating_pred.append(rating_pred)
+
+    if len(all_item_logits) == 1:
+        return all_item_logits[0], all_rating_pred[0]
+
+    return jnp.concatenate(all_item_logits, axis=0), jnp.concatenate(
+        all_rating_pred, axis=0
+    )
+
+
+def batch_holdout_predict_padded(
+    params,
+    idxs: np.ndarray,
+    vals: np.ndarray,
+    corpus_size: int,
+    device: str = "cpu",
+    downdate: bool = True,
+    mesh: Mesh | None = None,
+) -> tuple[jnp.ndarray, jnp.ndarray]:
+    """
+    Like `batch_holdout_predict`, but returns the outputs padded to the holdout batch size.
+
+    Row `i < len(idxs)` holds out `idxs[i]`; the remaining rows are padding.  Keeping the
+    padded shape lets downstream kernels reuse the same compiled programs across
+    profile lengths.
+    """
+    if device == "gpu":
+        return _batch_holdout_predict_gpu(
+            params, idxs, vals, corpus_size, downdate=downdate
+        )
+    else:
+        return _batch_holdout_predict_cpu(
+            params, idxs, vals, corpus_size, downdate=downdate, mesh=mesh
+        )
 
 
 def batch_holdout_predict(
@@ -431,6 +1186,8 @@ def batch_holdout_predict(
     vals: np.ndarray,
     corpus_size: int,
     device: str = "cpu",
+    downdate: bool = True,
+    mesh: Mesh | None = None,
 ) -> tuple[jnp.ndarray, jnp.ndarray]:
     """
     Run inference for every possible single-item holdout in the profile.
@@ -441,14 +1198,125 @@ def batch_holdout_predict(
         vals: Array of normalized rating values
         corpus_size: Size of the corpus
         device: Device to optimize for - "cpu" or "gpu"
+        downdate: If True, derive each holdout's `Dense_0` pre-activation from the
+                  full profile's by subtracting the held-out item's kernel rows
+                  (see `holdout_infer_outputs`).  If False, build the dense
+                  (n_items, corpus_size * 2) holdout batch and run the full model on it.
+        mesh: CPU devices to parallelize across, which `params` must be replicated on
+              (default: all available CPU devices)
 
     Returns:
         tuple of (item_logits, rating_pred) for each holdout
     """
-    if device == "gpu":
-        return _batch_holdout_predict_gpu(params, idxs, vals, corpus_size)
-    else:
-        return _batch_holdout_predict_cpu(params, idxs, vals, corpus_size)
+    n_items = len(idxs)
+    item_logits, rating_pred = batch_holdout_predict_padded(
+        params, idxs, vals, corpus_size, device=device, downdate=downdate, mesh=mesh
+    )
+    return item_logits[:n_items], rating_pred[:n_items]
+
+
+@partial(jax.jit, static_argnames=("use_alt_ranking",))
+def holdout_metrics_kernel(
+    item_logits: jnp.ndarray,
+    rating_pred: jnp.ndarray,
+    held_out_indices: jnp.ndarray,
+    logit_weight: float,
+    baseline_indices: jnp.ndarray,
+    baseline_scores: jnp.ndarray,
+    use_alt_ranking: bool = False,
+) -> tuple[jnp.ndarray, jnp.ndarray, jnp.ndarray, jnp.ndarray]:
+    """
+    Compute per-holdout metrics from the outputs of `batch_holdout_predict` in one pass.
+
+    Args:
+        item_logits: (n_items, corpus_size) holdout presence logits
+        rating_pred: (n_items, corpus_size) holdout rating predictions
+        held_out_indices: (n_items,) corpus index held out in each row
+        logit_weight: Weight for logits in recommendation score
+        baseline_indices: (n_baseline,) corpus indices of the full-profile top recommendations.
+                          May be empty, in which case all impact scores are 0.
+        baseline_scores: (n_baseline,) full-profile scores for `baseline_indices`
+        use_alt_ranking: Use `compute_recommendation_ranking_score_alt` for scoring
+
+    Returns:
+        tuple of (pred_ratings, presence_probs, recommendation_scores, impact_scores),
+        each of shape (n_items,)
+    """
+    ranking_fn = (
+        compute_recommendation_ranking_score_alt
+        if use_alt_ranking
+        else compute_recommendation_ranking_score
+    )
+
+    def row_metrics(logits_1d, preds_1d, held_out_idx):
+        scores, probs = ranking_fn(logits_1d, preds_1d, logit_weight)
+        impact = jnp.sum(jnp.abs(baseline_scores - scores[baseline_indices]))
+        return (
+            preds_1d[held_out_idx],
+            probs[held_out_idx],
+            scores[held_out_idx],
+            impact,
+        )
+
+    return jax.vmap(row_metrics)(item_logits, rating_pred, held_out_indices)
+
+
+@partial(jax.jit, static_argnames=("top_n", "use_alt_ranking"))
+def recommendation_contributions_kernel(
+    item_logits_1d: jnp.ndarray,
+    rating_pred_1d: jnp.ndarray,
+    holdout_item_logits: jnp.ndarray,
+    holdout_rating_pred: jnp.ndarray,
+    rec_indices: jnp.ndarray,
+    logit_weight: float,
+    n_items: int,
+    top_n: int,
+    use_alt_ranking: bool = False,
+) -> tuple[jnp.ndarray, jnp.ndarray]:
+    """
+    Find the profile items that contribute most to each recommendation's score.
+
+    A profile item's contribution to a recommendation is how much the recommendation's
+    score drops when that item is held out of the profile.
+
+    Args:
+        item_logits_1d: (corpus_size,) full-profile presence logits
+        rating_pred_1d: (corpus_size,) full-profile rating predictions
+        holdout_item_logits: (batch_size, corpus_size) holdout presence logits from
+                             `batch_holdout_predict_padded`
+        holdout_rating_pred: (batch_size, corpus_size) holdout rating predictions from
+                             `batch_holdout_predict_padded`
+        rec_indices: (n_recs,) corpus indices of the recommendations
+        logit_weight: Weight for logits in recommendation score
+        n_items: Number of profile items; holdout rows beyond this are padding and are never
+                 selected as contributors
+        top_n: Number of contributors to return per recommendation.  Must be <= batch_size.
+               If it is larger than n_items, the extra entries have a score drop of -inf.
+        use_alt_ranking: Use `compute_recommendation_ranking_score_alt` for scoring
+
+    Returns:
+        tuple of (score_drops, profile_positions), each of shape (n_recs, top_n) and
+        sorted by descending score drop.  `profile_positions` index into the profile.
+    """
+    ranking_fn = (
+        compute_recommendation_ranking_score_alt
+        if use_alt_ranking
+        else compute_recommendation_ranking_score
+    )
+
+    baseline_scores, _ = ranking_fn(item_logits_1d, rating_pred_1d, logit_weight)
+
+    def rec_scores(logits_1d, preds_1d):
+        scores, _ = ranking_fn(logits_1d, preds_1d, logit_weight)
+        return scores[rec_indices]
+
+    # (batch_size, n_recs)
+    holdout_scores = jax.vmap(rec_scores)(holdout_item_logits, holdout_rating_pred)
+    score_drops = baseline_scores[rec_indices][None, :] - holdout_scores
+    is_padding = jnp.arange(score_drops.shape[0]) >= n_items
+    score_drops = jnp.where(is_padding[:, None], -jnp.inf, score_drops)
+
+    return jax.lax.top_k(score_drops.T, top_n)
 
 
 def compute_holdout_metrics(
@@ -461,6 +1329,8 @@ def compute_holdout_metrics(
     baseline_top50_scores: np.ndarray | None = None,
     device: str = "cpu",
     use_alt_ranking: bool = False,
+    mesh: Mesh | None = None,
+    holdout_outputs: tuple[jnp.ndarray, jnp.ndarray] | None = None,
 ) -> dict:
     """
     Compute holdout metrics for a single user profile.
@@ -479,6 +1349,9 @@ def compute_holdout_metrics(
         baseline_top50_scores: Scores of top 50 recommendations from full profile
                                (required for impact score computation)
         device: Device to optimize for - "cpu" or "gpu"
+        mesh: CPU devices to parallelize across (see `batch_holdout_predict`)
+        holdout_outputs: (item_logits, rating_pred) from `batch_holdout_predict_padded`
+                         for this profile, if already computed; skips running the model
 
     Returns:
         dict with keys:
@@ -493,44 +1366,51 @@ def compute_holdout_metrics(
     """
     n_items = len(idxs)
 
-    # Use batched inference
-    item_logits, rating_pred = batch_holdout_predict(
-        params, idxs, vals, corpus_size, device=device
-    )
-
-    item_logits_np = np.array(item_logits)
-    rating_pred_np = np.array(rating_pred)
+    # Use batched inference.  Outputs stay padded so the metrics kernel is compiled once
+    # per holdout batch size rather than once per profile length.
+    if holdout_outputs is None:
+        holdout_outputs = batch_holdout_predict_padded(
+            params, idxs, vals, corpus_size, device=device, mesh=mesh
+        )
+    item_logits, rating_pred = holdout_outputs
+    held_out_indices = np.zeros(item_logits.shape[0], dtype=np.int32)
+    held_out_indices[:n_items] = idxs
 
-    held_out_indices_np = idxs
-    held_out_ratings_np = vals
+    if logit_weight is None:
+        logit_weight = CONF["rec_logit_weight"]
 
-    pred_ratings = np.array(
-        [rating_pred_np[i, held_out_indices_np[i]] for i in range(n_items)]
+    compute_impact = (
+        baseline_top50_indices is not None and baseline_top50_scores is not None
     )
-
-    probs = jax.nn.softmax(item_logits, axis=1)
-    probs_np = np.array(probs)
-    presence_probs = np.array(
-        [probs_np[i, held_out_indices_np[i]] for i in range(n_items)]
+    if compute_impact:
+        baseline_indices = jnp.asarray(baseline_top50_indices, dtype=jnp.int32)
+        baseline_scores = jnp.asarray(baseline_top50_scores, dtype=jnp.float32)
+    else:
+        baseline_indices = jnp.zeros((0,), dtype=jnp.int32)
+        baseline_scores = jnp.zeros((0,), dtype=jnp.float32)
+
+    pred_ratings, presence_probs, recommendation_scores, impact_scores = (
+        holdout_metrics_kernel(
+            item_logits,
+            rating_pred,
+            held_out_indices,
+            logit_weight,
+            baseline_indices,
+            baseline_scores,
+            use_alt_ranking=use_alt_ranking,
+        )
     )
 
-    rating_errors = np.abs(pred_ratings - held_out_ratings_np)
-
-    ranking_fn = (
-        compute_recommendation_ranking_score_alt
-        if use_alt_ranking
-        else compute_recommendation_ranking_score
+    pred_ratings, presence_probs, recommendation_scores, impact_scores = jax.device_get(
+        (pred_ratings, presence_probs, recommendation_scores, impact_scores)
     )
+    pred_ratings = pred_ratings[:n_items]
+    presence_probs = presence_probs[:n_items]
 
-    # Compute weighted recommendation scores for each held-out item
-    recommendation_scores = np.zeros(n_items, dtype=np.float32)
-    for i in range(n_items):
-        score, _ = ranking_fn(
-            jnp.array(item_logits_np[i]),
-            jnp.array(rating_pred_np[i]),
-            logit_weight,
-        )
-        recommendation_scores[i] = float(score[held_out_indices_np[i]])
+    held_out_indices_np = idxs
+    held_out_ratings_np = vals
+
+    rating_errors = np.abs(pred_ratings - held_out_ratings_np)
 
     result = {
         "rating_errors": rating_errors,
@@ -538,30 +1418,10 @@ def compute_holdout_metrics(
         "presence_probs": presence_probs,
         "held_out_indices": held_out_indices_np,
         "held_out_ratings": held_out_ratings_np,
-        "recommendation_scores": recommendation_scores,
+        "recommendation_scores": recommendation_scores[:n_items],
     }
 
-    # Compute impact scores if baseline top-50 data is provided
-    if baseline_top50_indices is not None and baseline_top50_scores is not None:
-        impact_scores = np.zeros(n_items, dtype=np.float32)
-        # We need to compute scores for all recommendations for each holdout
-        # This can still be slow if done in a loop, but the model inference part is done.
-
-        # Optimize impact score calculation using JAX if possible,
-        # but let's keep it simple for now as it's only top-50.
-        for i in range(n_items):
-            # Compute scores for the baseline top-50 items using this holdout's predictions
-            holdout_scores, _ = ranking_fn(
-                jnp.array(item_logits_np[i]),
-                jnp.array(rating_pred_np[i]),
-                logit_weight,
-            )
-            # Get scores for the specific top-50 indices
-            holdout_top50_scores = np.array(holdout_scores[baseline_top50_indices])
-            # Sum of absolute differences
-            impact_scores[i] = np.sum(
-                np.abs(baseline_top50_scores - holdout_top50_scores)
-            )
-        result["impact_scores"] = impact_scores
+    if compute_impact:
+        result["impact_scores"] = impact_scores[:n_items]
 
     return result
@@ -2,50 +2,88 @@
 HTTP API server for the anime recommendation model.
 
 Endpoints:
-    POST /recommend - Get recommendations for a user profile
+    POST /recommend - Get recommendations for a user profile (JSON, or binary columns;
+                      see PROFILE_COLUMNS_CONTENT_TYPE).  Responds with JSON, or with
+                      msgpack columns (RECOMMENDATION_COLUMNS_CONTENT_TYPE) if accepted
+    POST /recommend/batch - Get recommendations for many profiles with shared options
+    POST /recommend/stream - Same as /recommend, streamed as NDJSON so the
+                             recommendations arrive before the analysis finishes
     GET /health - Health check endpoint
+    GET /holdout/stats - Holdout batch bucket usage and compile counters
+    GET /lanes/stats - Load on each inference lane
 
 Run with: python model_server.py
     or:   uvicorn model_server:app --host 0.0.0.0 --port 8000
+    or:   python model_server.py --workers 4  (worker processes sharing one copy of the weights)
 """
 
 import asyncio
+import csv
+import hashlib
 import os
 import json
 import logging
+import multiprocessing
+import signal
+import socket
+import struct
+import tempfile
+import threading
+import time
 from collections import OrderedDict
 from concurrent.futures import ThreadPoolExecutor
-from dataclasses import dataclass
-from typing import TypedDict
+from dataclasses import dataclass, field, replace
+from typing import TypedDict, get_origin
 
+import msgpack
 import numpy as np
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import JSONResponse
-from pydantic import BaseModel
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from pydantic import BaseModel, ValidationError, field_validator, model_validator
 
 from model import (
     CONF,
     Recommender,
-    make_dense_profile,
-    infer_outputs,
-    compute_recommendation_ranking_score,
-    compute_recommendation_ranking_score_alt,
+    infer_outputs_sparse,
+    batch_infer_outputs_sparse,
+    pad_sparse_profiles,
     rank_by_weighted_score,
+    batch_rank_top_k,
     compute_holdout_metrics,
+    recommendation_contributions_kernel,
     setup_jax_cpu,
     get_sharding_mesh,
     get_num_cpu_devices,
-    batch_holdout_predict,
+    partition_devices,
+    batch_holdout_predict_padded,
+    get_holdout_bucket_sizes,
+    get_holdout_bucket_stats,
+    get_compilation_cache_stats,
+    sparse_profile_pad_length,
 )
 
+# Set by `serve_workers` for each worker process: CPUs to pin this process to, and the
+# number of JAX CPU devices to use.  Pinning must happen before JAX starts its thread pools.
+_WORKER_CPUS = os.environ.get("INFERENCE_WORKER_CPUS")
+if _WORKER_CPUS:
+    os.sched_setaffinity(0, {int(cpu) for cpu in _WORKER_CPUS.split(",")})
+_NUM_CPU_DEVICES = os.environ.get("NUM_CPU_DEVICES")
+
 # Configure JAX for CPU parallelism
-setup_jax_cpu()
+setup_jax_cpu(num_devices=int(_NUM_CPU_DEVICES) if _NUM_CPU_DEVICES else None)
 
 import jax
 import jax.numpy as jnp
-from jax.sharding import NamedSharding, PartitionSpec as P
+from jax.sharding import Mesh, NamedSharding, PartitionSpec as P
 from flax import serialization
-from normalize_ratings import normalize_ratings
+from normalize_ratings import normalize_ratings, normalize_ratings_batch
+from weight_bundle import (
+    compute_popularity_distribution,
+    compute_weights_checksum,
+    export_weight_bundle,
+    read_weight_bundle,
+)
 
 logging.basicConfig(
     level=logging.INFO,
@@ -54,51 +92,642 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+@dataclass
+class _CacheEntry:
+    body: bytes
+    created_at: float
+    # How long the response took to compute, i.e. the latency a hit saves
+    compute_seconds: float
+
+
 class LRUCache:
-    """Simple LRU cache with fixed maximum size."""
+    """
+    LRU cache of encoded responses, bounded by total size with an optional TTL.
 
-    def __init__(self, max_size: int = 500):
-        self.cache = OrderedDict()
-        self.max_size = max_size
+    Keys are digests of the preprocessed profile and the request options (see
+    `make_key`), so requests that only differ in entry order or in entries that don't
+    reach the model share an entry.
+    """
 
-    def _make_key(self, request: "RecommendRequest") -> str:
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, ttl_seconds: float = 0):
+        self.cache: OrderedDict[bytes, _CacheEntry] = OrderedDict()
+        self.max_bytes = max_bytes
+        # 0 disables expiry
+        self.ttl_seconds = ttl_seconds
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.saved_seconds = 0.0
+        # Incremented whenever entries are added or cleared, to tell if a snapshot is stale
+        self.writes = 0
+
+    @staticmethod
+    def make_key(
+        request: "RecommendOptions",
+        corpus_indices: np.ndarray,
+        original_ratings: np.ndarray,
+        content_type: str = "application/json",
+    ) -> bytes:
         """
-        Create a cache key from a request.
-
-        Uses Pydantic's model_dump with mode='json' for consistent serialization.
-        This ensures that new fields added to the model in the future will
-        automatically be included in the cache key.
+        Create a cache key from a request, its preprocessed profile and the content type
+        the response is encoded as.
+
+        The profile is represented by the output of `preprocess_profile`, which is sorted
+        and has out-of-corpus and unwatched entries dropped.  Options are taken from
+        Pydantic's model_dump so that new fields added to `RecommendOptions` in the future
+        are automatically included in the cache key.  A profile gets the same key whether
+        it was sent to `/recommend` or `/recommend/batch`.  JSON keys don't depend on
+        `content_type`, so they stay valid across cache snapshots.
         """
-        # Get JSON-serializable dict, then convert to sorted tuple for hashing
-        req_dict = request.model_dump(mode="json")
-        # Convert to a stable string representation
-        return json.dumps(req_dict, sort_keys=True)
-
-    def get(self, request: "RecommendRequest") -> dict | None:
-        """Get cached response for a request, or None if not found."""
-        key = self._make_key(request)
-        if key in self.cache:
-            # Move to end (mark as recently used)
-            self.cache.move_to_end(key)
-            return self.cache[key]
-        return None
-
-    def put(self, request: "RecommendRequest", response: dict) -> None:
-        """Store a response in the cache."""
-        key = self._make_key(request)
+        options = request.model_dump(
+            mode="json", include=set(RecommendOptions.model_fields)
+        )
+        if options["logit_weight"] is None:
+            options["logit_weight"] = CONF["rec_logit_weight"]
 
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(np.ascontiguousarray(corpus_indices, dtype=np.int32).tobytes())
+        digest.update(
+            np.ascontiguousarray(original_ratings, dtype=np.float32).tobytes()
+        )
+        digest.update(json.dumps(options, sort_keys=True).encode("utf-8"))
+        if content_type != "application/json":
+            digest.update(content_type.encode("utf-8"))
+        return digest.digest()
+
+    def get(self, key: bytes) -> bytes | None:
+        """Get a cached response body, or None if not found or expired."""
+        entry = self.cache.get(key)
+        if entry is not None and self._is_expired(entry):
+            self._remove(key)
+            self.expirations += 1
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+
+        # Move to end (mark as recently used)
+        self.cache.move_to_end(key)
+        self.hits += 1
+        self.saved_seconds += entry.compute_seconds
+        return entry.body
+
+    def put(self, key: bytes, body: bytes, compute_seconds: float = 0.0) -> None:
+        """Store a response body, evicting the least recently used entries to make room."""
         # If key exists, remove it first (will be re-added at the end)
         if key in self.cache:
-            del self.cache[key]
-        # If cache is full, remove oldest item
-        elif len(self.cache) >= self.max_size:
-            self.cache.popitem(last=False)
+            self._remove(key)
+        if len(body) > self.max_bytes:
+            return
+        while self.nbytes + len(body) > self.max_bytes:
+            self._remove(next(iter(self.cache)))
+            self.evictions += 1
+
+        self.cache[key] = _CacheEntry(
+            body=body, created_at=time.monotonic(), compute_seconds=compute_seconds
+        )
+        self.nbytes += len(body)
+        self.writes += 1
+
+    def _is_expired(self, entry: _CacheEntry) -> bool:
+        return (
+            self.ttl_seconds > 0
+            and time.monotonic() - entry.created_at > self.ttl_seconds
+        )
 
-        self.cache[key] = response
+    def _remove(self, key: bytes) -> None:
+        self.nbytes -= len(self.cache.pop(key).body)
 
     def clear(self) -> None:
         """Clear all cached entries."""
         self.cache.clear()
+        self.nbytes = 0
+        self.writes += 1
+
+    def entries(self) -> list[tuple[bytes, _CacheEntry]]:
+        """Live entries from least to most recently used."""
+        return [
+            (key, entry)
+            for key, entry in self.cache.items()
+            if not self._is_expired(entry)
+        ]
+
+    def restore(self, entries: list[tuple[bytes, _CacheEntry]]) -> int:
+        """
+        Add entries from a snapshot, keeping their age and recency order.
+
+        Restored entries count as less recently used than any already in the cache.  If
+        they don't all fit, the most recently used ones are kept.
+
+        Returns:
+            Number of entries restored
+        """
+        budget = self.max_bytes - self.nbytes
+        restored = 0
+        for key, entry in reversed(entries):
+            if self._is_expired(entry) or key in self.cache:
+                continue
+            if len(entry.body) > budget:
+                break
+            budget -= len(entry.body)
+            self.cache[key] = entry
+            self.cache.move_to_end(key, last=False)
+            self.nbytes += len(entry.body)
+            restored += 1
+        return restored
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.cache),
+            "bytes": self.nbytes,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "avg_saved_latency_ms": (
+                1000 * self.saved_seconds / self.hits if self.hits else 0.0
+            ),
+        }
+
+    def __len__(self) -> int:
+        return len(self.cache)
+
+
+RESPONSE_CACHE_SNAPSHOT_MAGIC = b"SPROUTRC"
+RESPONSE_CACHE_SNAPSHOT_VERSION = 1
+# magic, version, weights checksum, wall-clock time written, number of entries
+_SNAPSHOT_PREAMBLE = struct.Struct("<8sI16sdQ")
+# key, age in seconds, compute seconds, body length; followed by the body
+_SNAPSHOT_RECORD = struct.Struct("<16sddI")
+
+
+def write_cache_snapshot(
+    path: str, weights_checksum: bytes, entries: list[tuple[bytes, _CacheEntry]]
+) -> None:
+    """
+    Write response cache entries to a snapshot file.
+
+    Only reads `entries`, so it can run off the event loop on the result of
+    `LRUCache.entries()`.  The file is replaced atomically.
+
+    Args:
+        path: Snapshot file path
+        weights_checksum: `compute_response_checksum` of the model that produced the
+            responses; snapshots are only restored for the same weights and metadata
+        entries: (key, entry) pairs from least to most recently used
+    """
+    now = time.monotonic()
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(
+            _SNAPSHOT_PREAMBLE.pack(
+                RESPONSE_CACHE_SNAPSHOT_MAGIC,
+                RESPONSE_CACHE_SNAPSHOT_VERSION,
+                weights_checksum,
+                time.time(),
+                len(entries),
+            )
+        )
+        for key, entry in entries:
+            f.write(
+                _SNAPSHOT_RECORD.pack(
+                    key, now - entry.created_at, entry.compute_seconds, len(entry.body)
+                )
+            )
+            f.write(entry.body)
+    os.replace(tmp_path, path)
+
+
+def read_cache_snapshot(
+    path: str, weights_checksum: bytes
+) -> list[tuple[bytes, _CacheEntry]]:
+    """
+    Read response cache entries written by `write_cache_snapshot`.
+
+    Returns:
+        (key, entry) pairs from least to most recently used, with `created_at` rebased
+        onto this process's monotonic clock.  Empty if the snapshot is missing, invalid
+        or was written for different model weights or metadata.
+    """
+    if not os.path.exists(path):
+        return []
+    with open(path, "rb") as f:
+        data = f.read()
+
+    try:
+        magic, version, checksum, written_at, num_entries = (
+            _SNAPSHOT_PREAMBLE.unpack_from(data, 0)
+        )
+    except struct.error:
+        logger.warning(f"Ignoring truncated response cache snapshot {path}")
+        return []
+    if magic != RESPONSE_CACHE_SNAPSHOT_MAGIC:
+        logger.warning(f"Ignoring {path}: not a response cache snapshot")
+        return []
+    if version != RESPONSE_CACHE_SNAPSHOT_VERSION:
+        logger.info(f"Ignoring response cache snapshot {path} with version {version}")
+        return []
+    if checksum != weights_checksum:
+        logger.info(
+            f"Ignoring response cache snapshot {path} from different weights or metadata"
+        )
+        return []
+
+    # Time between writing the snapshot and now counts towards each entry's age
+    created_offset = time.monotonic() - max(time.time() - written_at, 0.0)
+    entries = []
+    offset = _SNAPSHOT_PREAMBLE.size
+    try:
+        for _ in range(num_entries):
+            key, age, compute_seconds, body_length = _SNAPSHOT_RECORD.unpack_from(
+                data, offset
+            )
+            offset += _SNAPSHOT_RECORD.size
+            body = data[offset : offset + body_length]
+            if len(body) != body_length:
+                raise struct.error("body extends past end of snapshot")
+            offset += body_length
+            entries.append(
+                (
+                    key,
+                    _CacheEntry(
+                        body=body,
+                        created_at=created_offset - age,
+                        compute_seconds=compute_seconds,
+                    ),
+                )
+            )
+    except struct.error:
+        logger.warning(
+            f"Response cache snapshot {path} is truncated, "
+            f"restoring {len(entries)} of {num_entries} entries"
+        )
+    return entries
+
+
+def encode_json_response(content: dict) -> bytes:
+    """Encode a response body the same way FastAPI's JSONResponse does."""
+    return json.dumps(
+        content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+
+@dataclass
+class Recommendations:
+    """
+    Ranked recommendations for one profile as parallel (k,) arrays.  Converted to dicts
+    only for JSON responses (see `to_dicts`).
+    """
+
+    corpus_indices: np.ndarray
+    anime_ids: np.ndarray
+    scores: np.ndarray
+    probabilities: np.ndarray
+    predicted_ratings: np.ndarray
+    # Set by `compute_recommendation_contributions`.  The contributors of
+    # recommendation i are rows contributor_offsets[i]:contributor_offsets[i + 1] of
+    # the other contributor arrays.
+    contributor_offsets: np.ndarray | None = None  # (k + 1,)
+    contributor_corpus_indices: np.ndarray | None = None
+    contributor_anime_ids: np.ndarray | None = None
+    contributor_scores: np.ndarray | None = None
+
+    def __len__(self) -> int:
+        return len(self.corpus_indices)
+
+    def to_dicts(self) -> list[dict]:
+        """Convert to the list of recommendation objects of the JSON response."""
+        recommendations = [
+            {
+                "anime_id": anime_id,
+                "corpus_idx": corpus_idx,
+                "score": score,
+                "probability": probability,
+                "predicted_rating": predicted_rating,
+            }
+            for anime_id, corpus_idx, score, probability, predicted_rating in zip(
+                self.anime_ids.tolist(),
+                self.corpus_indices.tolist(),
+                self.scores.tolist(),
+                self.probabilities.tolist(),
+                self.predicted_ratings.tolist(),
+            )
+        ]
+        if self.contributor_offsets is not None:
+            contributors = [
+                {
+                    "anime_id": anime_id,
+                    "corpus_idx": corpus_idx,
+                    "score_contribution": score_contribution,
+                }
+                for anime_id, corpus_idx, score_contribution in zip(
+                    self.contributor_anime_ids.tolist(),
+                    self.contributor_corpus_indices.tolist(),
+                    self.contributor_scores.tolist(),
+                )
+            ]
+            offsets = self.contributor_offsets.tolist()
+            for rec, start, end in zip(recommendations, offsets, offsets[1:]):
+                rec["top_contributors"] = contributors[start:end]
+        return recommendations
+
+
+@dataclass
+class ProfileHoldout:
+    """Holdout analysis of each profile item as parallel arrays, with summary stats."""
+
+    corpus_indices: np.ndarray
+    anime_ids: np.ndarray
+    true_ratings: np.ndarray
+    true_normalized_ratings: np.ndarray
+    predicted_ratings: np.ndarray
+    rating_errors: np.ndarray
+    presence_probabilities: np.ndarray
+    recommendation_scores: np.ndarray
+    impact_scores: np.ndarray
+    mean_rating_error: float
+    std_rating_error: float
+    mean_presence_prob: float
+    std_presence_prob: float
+
+    def to_dict(self) -> dict:
+        """Convert to the `profile_holdout` object of the JSON response."""
+        items = [
+            {
+                "anime_id": anime_id,
+                "corpus_idx": corpus_idx,
+                "true_rating": true_rating,
+                "true_normalized_rating": true_normalized_rating,
+                "predicted_rating": predicted_rating,
+                "rating_error": rating_error,
+                "presence_probability": presence_probability,
+                "recommendation_score": recommendation_score,
+                "impact_score": impact_score,
+            }
+            for (
+                anime_id,
+                corpus_idx,
+                true_rating,
+                true_normalized_rating,
+                predicted_rating,
+                rating_error,
+                presence_probability,
+                recommendation_score,
+                impact_score,
+            ) in zip(
+                self.anime_ids.tolist(),
+                self.corpus_indices.tolist(),
+                self.true_ratings.tolist(),
+                self.true_normalized_ratings.tolist(),
+                self.predicted_ratings.tolist(),
+                self.rating_errors.tolist(),
+                self.presence_probabilities.tolist(),
+                self.recommendation_scores.tolist(),
+                self.impact_scores.tolist(),
+            )
+        ]
+        return {
+            "items": items,
+            "mean_rating_error": self.mean_rating_error,
+            "std_rating_error": self.std_rating_error,
+            "mean_presence_prob": self.mean_presence_prob,
+            "std_presence_prob": self.std_presence_prob,
+        }
+
+
+# Content type of the compact `/recommend` response, chosen with the Accept header.  A
+# msgpack map with the fields of the JSON response, except that each list of objects is
+# a map from field name to a packed little-endian column (msgpack bin), int32 for IDs,
+# indices and offsets and float32 for everything else, as are the normalization
+# stats' arrays.  The contributors of all recommendations are concatenated, those of
+# recommendation i being rows offsets[i]:offsets[i + 1]:
+#   {"recommendations": {"anime_id", "corpus_idx", "score", "probability",
+#                        "predicted_rating",
+#                        "top_contributors" (with contribution analysis):
+#                            {"offsets", "anime_id", "corpus_idx", "score_contribution"}},
+#    "profile_holdout": nil or {"items": {"anime_id", "corpus_idx", "true_rating", ...},
+#                               "mean_rating_error", ...},
+#    "normalization_stats": {...}}
+RECOMMENDATION_COLUMNS_CONTENT_TYPE = "application/x-recommendation-columns"
+
+
+def _pack_columns(columns: dict[str, tuple[np.ndarray, str]]) -> dict[str, bytes]:
+    """Pack {name: (array, dtype)} into {name: little-endian bytes}."""
+    return {
+        name: np.ascontiguousarray(values, dtype=dtype).tobytes()
+        for name, (values, dtype) in columns.items()
+    }
+
+
+def encode_columns_response(
+    recommendations: Recommendations,
+    profile_holdout: ProfileHoldout | None,
+    norm_stats: dict,
+) -> bytes:
+    """Encode a `/recommend` response as RECOMMENDATION_COLUMNS_CONTENT_TYPE."""
+    recommendation_columns = _pack_columns(
+        {
+            "anime_id": (recommendations.anime_ids, "<i4"),
+            "corpus_idx": (recommendations.corpus_indices, "<i4"),
+            "score": (recommendations.scores, "<f4"),
+            "probability": (recommendations.probabilities, "<f4"),
+            "predicted_rating": (recommendations.predicted_ratings, "<f4"),
+        }
+    )
+    if recommendations.contributor_offsets is not None:
+        recommendation_columns["top_contributors"] = _pack_columns(
+            {
+                "offsets": (recommendations.contributor_offsets, "<i4"),
+                "anime_id": (recommendations.contributor_anime_ids, "<i4"),
+                "corpus_idx": (recommendations.contributor_corpus_indices, "<i4"),
+                "score_contribution": (recommendations.contributor_scores, "<f4"),
+            }
+        )
+
+    holdout = None
+    if profile_holdout is not None:
+        holdout = {
+            "items": _pack_columns(
+                {
+                    "anime_id": (profile_holdout.anime_ids, "<i4"),
+                    "corpus_idx": (profile_holdout.corpus_indices, "<i4"),
+                    "true_rating": (profile_holdout.true_ratings, "<f4"),
+                    "true_normalized_rating": (
+                        profile_holdout.true_normalized_ratings,
+                        "<f4",
+                    ),
+                    "predicted_rating": (profile_holdout.predicted_ratings, "<f4"),
+                    "rating_error": (profile_holdout.rating_errors, "<f4"),
+                    "presence_probability": (
+                        profile_holdout.presence_probabilities,
+                        "<f4",
+                    ),
+                    "recommendation_score": (
+                        profile_holdout.recommendation_scores,
+                        "<f4",
+                    ),
+                    "impact_score": (profile_holdout.impact_scores, "<f4"),
+                }
+            ),
+            "mean_rating_error": profile_holdout.mean_rating_error,
+            "std_rating_error": profile_holdout.std_rating_error,
+            "mean_presence_prob": profile_holdout.mean_presence_prob,
+            "std_presence_prob": profile_holdout.std_presence_prob,
+        }
+
+    return msgpack.packb(
+        {
+            "recommendations": recommendation_columns,
+            "profile_holdout": holdout,
+            "normalization_stats": {
+                k: (
+                    np.ascontiguousarray(v, dtype="<f4").tobytes()
+                    if isinstance(v, np.ndarray)
+                    else v
+                )
+                for k, v in norm_stats.items()
+            },
+        },
+        use_bin_type=True,
+    )
+
+
+def negotiate_response_content_type(accept: str | None) -> str:
+    """
+    Pick the `/recommend` response encoding for an Accept header:
+    RECOMMENDATION_COLUMNS_CONTENT_TYPE if it is accepted and not ranked below JSON,
+    otherwise JSON.
+    """
+    quality = {}
+    for media_range in (accept or "").split(","):
+        media_type, *params = [part.strip() for part in media_range.split(";")]
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        quality[media_type.lower()] = q
+    columns_quality = quality.get(RECOMMENDATION_COLUMNS_CONTENT_TYPE, 0.0)
+    if columns_quality > 0 and columns_quality >= quality.get("application/json", 0.0):
+        return RECOMMENDATION_COLUMNS_CONTENT_TYPE
+    return "application/json"
+
+
+def _buffer_nbytes(array: jax.Array | np.ndarray) -> int:
+    """Bytes held by an array, counting every copy of a replicated device array."""
+    if isinstance(array, jax.Array):
+        sharding = array.sharding
+        shard_size = int(np.prod(sharding.shard_shape(array.shape)))
+        return shard_size * array.dtype.itemsize * len(sharding.device_set)
+    return array.nbytes
+
+
+@dataclass
+class ProfileOutputs:
+    """
+    Raw model outputs for one preprocessed profile, as device arrays (see
+    `_place_outputs`) or host arrays.
+    """
+
+    item_logits: jax.Array | np.ndarray  # (corpus_size,)
+    rating_pred: jax.Array | np.ndarray  # (corpus_size,)
+    # Outputs of `batch_holdout_predict_padded`, padded to the holdout batch size
+    holdout_item_logits: jax.Array | np.ndarray | None = None
+    holdout_rating_pred: jax.Array | np.ndarray | None = None
+
+    @property
+    def nbytes(self) -> int:
+        return sum(
+            _buffer_nbytes(array)
+            for array in (
+                self.item_logits,
+                self.rating_pred,
+                self.holdout_item_logits,
+                self.holdout_rating_pred,
+            )
+            if array is not None
+        )
+
+
+class ProfileOutputCache:
+    """
+    LRU cache of raw model outputs keyed by the preprocessed profile.
+
+    Model outputs only depend on `(corpus_indices, normalized_ratings)`, so requests that
+    differ only in ranking options (`top_k`, `logit_weight`, `use_alt_ranking`,
+    `niche_boost_factor`) are re-ranked from cached outputs without running the model.
+    Bounded by total size rather than entry count, since entries holding holdout outputs
+    are several hundred times larger than those that don't.
+    """
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024):
+        # key -> (outputs, size of outputs when stored)
+        self.cache: OrderedDict[bytes, tuple[ProfileOutputs, int]] = OrderedDict()
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        # Accessed from every inference lane's executor thread
+        self._lock = threading.Lock()
+
+    def _make_key(
+        self, corpus_indices: np.ndarray, normalized_ratings: np.ndarray
+    ) -> bytes:
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(np.ascontiguousarray(corpus_indices, dtype=np.int32).tobytes())
+        digest.update(
+            np.ascontiguousarray(normalized_ratings, dtype=np.float32).tobytes()
+        )
+        return digest.digest()
+
+    def get(
+        self, corpus_indices: np.ndarray, normalized_ratings: np.ndarray
+    ) -> ProfileOutputs | None:
+        """Get cached outputs for a profile, or None if not found."""
+        key = self._make_key(corpus_indices, normalized_ratings)
+        with self._lock:
+            entry = self.cache.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.cache.move_to_end(key)
+            return entry[0]
+
+    def put(
+        self,
+        corpus_indices: np.ndarray,
+        normalized_ratings: np.ndarray,
+        outputs: ProfileOutputs,
+    ) -> None:
+        """Store (or update the size of) a profile's outputs, evicting the oldest entries."""
+        key = self._make_key(corpus_indices, normalized_ratings)
+        nbytes = outputs.nbytes
+        with self._lock:
+            if key in self.cache:
+                self.nbytes -= self.cache.pop(key)[1]
+            if nbytes > self.max_bytes:
+                return
+            while self.nbytes + nbytes > self.max_bytes:
+                _, (_, evicted_nbytes) = self.cache.popitem(last=False)
+                self.nbytes -= evicted_nbytes
+            self.cache[key] = (outputs, nbytes)
+            self.nbytes += nbytes
+
+    def clear(self) -> None:
+        """Clear all cached entries."""
+        with self._lock:
+            self.cache.clear()
+            self.nbytes = 0
 
     def __len__(self) -> int:
         return len(self.cache)
@@ -110,6 +739,56 @@ class UserAnimeEntry(TypedDict):
     watch_status: str  # "completed", "watching", "dropped", "plan_to_watch", etc.
 
 
+# Watch statuses by code.  Codes follow the order of the names, so sorting by code sorts
+# the same way as sorting by name.  Any other status is coded as WATCH_STATUS_OTHER.
+WATCH_STATUSES = ("", "completed", "dropped", "on_hold", "plan_to_watch", "watching")
+WATCH_STATUS_CODES = {status: code for code, status in enumerate(WATCH_STATUSES)}
+WATCH_STATUS_OTHER = 255
+# Statuses that count as having seen the anime even without a rating
+_WATCHED_STATUS_CODES = np.array(
+    [WATCH_STATUS_CODES[s] for s in ("completed", "watching", "dropped")],
+    dtype=np.uint8,
+)
+
+# Content type of the binary profile body accepted by `/recommend`.  Little-endian:
+#   uint32 n, int32 anime_ids[n], float32 ratings[n], uint8 watch_status_codes[n]
+# with codes indexing WATCH_STATUSES.  Request options go in the query string.
+PROFILE_COLUMNS_CONTENT_TYPE = "application/x-profile-columns"
+
+
+def encode_watch_statuses(watch_statuses: list[str]) -> np.ndarray:
+    """Map watch status names to codes, coding unknown statuses as WATCH_STATUS_OTHER."""
+    names, inverse = np.unique(
+        np.asarray(watch_statuses, dtype=str), return_inverse=True
+    )
+    codes = np.array(
+        [WATCH_STATUS_CODES.get(name, WATCH_STATUS_OTHER) for name in names],
+        dtype=np.uint8,
+    )
+    return codes[inverse.reshape(-1)]
+
+
+def decode_profile_columns(body: bytes) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Parse a PROFILE_COLUMNS_CONTENT_TYPE body.
+
+    Returns:
+        (anime_ids, ratings, watch_status_codes) arrays, as views into `body`
+    """
+    header = struct.Struct("<I")
+    if len(body) < header.size:
+        raise ValueError("profile body is too short")
+    (n,) = header.unpack_from(body)
+    if len(body) != header.size + 9 * n:
+        raise ValueError(f"profile body has {len(body)} bytes, expected {4 + 9 * n}")
+    anime_ids = np.frombuffer(body, dtype="<i4", count=n, offset=header.size)
+    ratings = np.frombuffer(body, dtype="<f4", count=n, offset=header.size + 4 * n)
+    watch_status_codes = np.frombuffer(
+        body, dtype=np.uint8, count=n, offset=header.size + 8 * n
+    )
+    return anime_ids, ratings, watch_status_codes
+
+
 @dataclass
 class RecommenderModel:
     """Holds the loaded model and corpus mapping."""
@@ -118,17 +797,283 @@ class RecommenderModel:
     corpus_ids: list[int]
     anime_id_to_corpus_idx: dict[int, int]
     corpus_size: int
+    # corpus_idx_lookup[anime_id] is the corpus index of `anime_id`, or -1
+    corpus_idx_lookup: np.ndarray
+    # `corpus_ids` as an array, for looking up the anime IDs of ranked corpus indices
+    corpus_ids_array: np.ndarray
     popularity_distribution: np.ndarray | None = (
         None  # Normalized popularity for each corpus item
     )
+    # `popularity_distribution` placed on the same devices as `params`, for ranking
+    device_popularity: jax.Array | np.ndarray | None = None
+    mesh: Mesh | None = (
+        None  # Devices `params` are replicated on; None means all devices
+    )
+    # (corpus_size,) bool masks of the items with each media type / genre ID, for
+    # resolving the `excluded_*` request options
+    media_type_masks: dict[str, np.ndarray] = field(default_factory=dict)
+    genre_masks: dict[int, np.ndarray] = field(default_factory=dict)
+    # Franchise of each corpus item, and of any anime by ID (see `build_franchise_ids`)
+    franchise_ids: np.ndarray | None = None
+    franchise_id_lookup: np.ndarray | None = None
+    # `franchise_ids` with -1 for items `collapse_franchises` doesn't apply to, placed
+    # on the same devices as `params`
+    device_franchise_ids: jax.Array | np.ndarray | None = None
+
+    @property
+    def num_devices(self) -> int:
+        return get_num_cpu_devices() if self.mesh is None else self.mesh.size
 
 
 # Global model instance - loaded once at startup
 _model: RecommenderModel | None = None
-# Single-thread executor to serialize model inference (JAX uses all CPU threads internally)
-_inference_executor = ThreadPoolExecutor(max_workers=1)
+# Number of inference lanes to split the CPU devices into (see `InferenceLanes`)
+_INFERENCE_LANES = int(os.environ.get("INFERENCE_LANES", "1"))
+# Estimated cost (in forward passes) above which a job counts as heavy and is kept off
+# the lane reserved for cheap requests
+_INFERENCE_LANE_HEAVY_COST = float(os.environ.get("INFERENCE_LANE_HEAVY_COST", "16"))
 # Global cache for recommendation responses
-_cache = LRUCache(max_size=500)
+_cache = LRUCache(
+    max_bytes=int(float(os.environ.get("RESPONSE_CACHE_MAX_MB", "64")) * 1024 * 1024),
+    ttl_seconds=float(os.environ.get("RESPONSE_CACHE_TTL_S", "0")),
+)
+# Optional file the response cache is saved to periodically and on shutdown, and
+# restored from at startup if it was written for the same model weights
+_RESPONSE_CACHE_SNAPSHOT_PATH = os.environ.get("RESPONSE_CACHE_SNAPSHOT_PATH")
+# Seconds between snapshots; 0 only saves on shutdown
+_RESPONSE_CACHE_SNAPSHOT_INTERVAL_S = float(
+    os.environ.get("RESPONSE_CACHE_SNAPSHOT_INTERVAL_S", "300")
+)
+# Checksum of the loaded weights and metadata (see `compute_response_checksum`), set
+# at startup if snapshots are enabled
+_weights_checksum: bytes | None = None
+_snapshot_task: asyncio.Task | None = None
+_snapshot_writes = 0
+# Global cache for raw model outputs, so re-ranking a profile skips the model
+_output_cache = ProfileOutputCache(
+    max_bytes=int(float(os.environ.get("OUTPUT_CACHE_MAX_MB", "256")) * 1024 * 1024)
+)
+# Max number of concurrent simple-path requests to run as one batch; 1 disables batching
+_INFERENCE_MAX_BATCH_SIZE = int(os.environ.get("INFERENCE_MAX_BATCH_SIZE", "32"))
+# How long to wait for more requests to join a batch after the first one arrives
+_INFERENCE_BATCH_WINDOW_MS = float(os.environ.get("INFERENCE_BATCH_WINDOW_MS", "2"))
+# Most profiles accepted by one `/recommend/batch` request
+_RECOMMEND_BATCH_MAX_PROFILES = int(
+    os.environ.get("RECOMMEND_BATCH_MAX_PROFILES", "4096")
+)
+# Profiles per forward pass for `/recommend/batch`.  Batch sizes up to this are compiled
+# during warmup.
+_RECOMMEND_BATCH_CHUNK_SIZE = int(
+    os.environ.get(
+        "RECOMMEND_BATCH_CHUNK_SIZE", str(max(_INFERENCE_MAX_BATCH_SIZE, 32))
+    )
+)
+# Compile every served function and shape at startup before reporting healthy
+_WARMUP_ENABLED = os.environ.get("WARMUP", "1") != "0"
+# Largest profile length (after filtering to the corpus) to compile holdout shapes for
+_WARMUP_MAX_PROFILE_LENGTH = int(os.environ.get("WARMUP_MAX_PROFILE_LENGTH", "2048"))
+# `top_k` values to compile for.  The web app requests exactly its display count, with
+# filtering done through the `excluded_*` options.
+_WARMUP_TOP_K = [
+    int(k) for k in os.environ.get("WARMUP_TOP_K", "50").split(",") if k.strip()
+]
+_warmup_complete = False
+_warmup_task: asyncio.Task | None = None
+
+
+def _place_params(params, mesh: Mesh):
+    """Replicate params (or any tree of arrays) on every device of `mesh`."""
+    if mesh.size == 1:
+        # `device_put` aliases aligned host buffers on CPU, so arrays mapped from a
+        # weight bundle are used in place rather than copied
+        device = mesh.devices.flat[0]
+        return jax.tree.map(lambda x: jax.device_put(x, device), params)
+
+    # Empty tuple for PartitionSpec means replicated on all axes
+    replicated_sharding = NamedSharding(mesh, P())
+    return jax.tree.map(lambda x: jax.device_put(x, replicated_sharding), params)
+
+
+def load_corpus_masks(
+    metadata_path: str, corpus_ids: list[int]
+) -> tuple[dict[str, np.ndarray], dict[int, np.ndarray]]:
+    """
+    Build per-media-type and per-genre masks over the corpus from the metadata CSV.
+
+    Genres are read from the optional `genres` column (a JSON list of genre IDs); older
+    metadata files without it give no genre masks.
+
+    Returns:
+        (media_type_masks, genre_masks), each mapping a media type or genre ID to a
+        (corpus_size,) bool array of the corpus items that have it
+    """
+    anime_id_to_corpus_idx = {anime_id: idx for idx, anime_id in enumerate(corpus_ids)}
+    media_type_masks: dict[str, np.ndarray] = {}
+    genre_masks: dict[int, np.ndarray] = {}
+
+    def set_mask(masks: dict, key, corpus_idx: int) -> None:
+        if key not in masks:
+            masks[key] = np.zeros(len(corpus_ids), dtype=bool)
+        masks[key][corpus_idx] = True
+
+    with open(metadata_path, "r", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        has_genres = "genres" in (reader.fieldnames or [])
+        for row in reader:
+            corpus_idx = anime_id_to_corpus_idx.get(int(row["id"]))
+            if corpus_idx is None:
+                continue
+            set_mask(media_type_masks, row["media_type"] or "unknown", corpus_idx)
+            if has_genres and row["genres"]:
+                for genre_id in json.loads(row["genres"]):
+                    set_mask(genre_masks, int(genre_id), corpus_idx)
+
+    if not has_genres:
+        logger.warning(
+            f"No genres column in {metadata_path}, excluded_genre_ids will be ignored"
+        )
+    return media_type_masks, genre_masks
+
+
+# `related_anime` relation types that join two anime into one franchise.  The web app
+# also followed "other" when hiding extra seasons, but only a few steps from each
+# rated anime; joined transitively it chains unrelated series into one franchise.
+FRANCHISE_RELATION_TYPES = ("sequel", "prequel", "parent_story", "side_story")
+# Media types left out of franchise collapsing, since the web app filters them with
+# their own options
+_FRANCHISE_EXEMPT_MEDIA_TYPES = ("movie", "music", "ona", "ova", "special")
+
+
+def build_franchise_ids(
+    metadata_path: str, corpus_ids: list[int]
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Group the corpus into franchises using the `related_anime` column of the metadata.
+
+    A franchise is a connected component of anime joined by FRANCHISE_RELATION_TYPES
+    relations, found with a union-find over every anime in the metadata so that links
+    through anime outside the corpus still count.
+
+    Returns:
+        - franchise_ids: (corpus_size,) int32 franchise ID of each corpus item, numbered
+          from 0
+        - franchise_id_lookup: int32 array where franchise_id_lookup[anime_id] is the
+          franchise of any anime in the metadata, or -1 if its franchise has no corpus
+          items
+    """
+    parents: dict[int, int] = {}
+
+    def find(anime_id: int) -> int:
+        root = parents.setdefault(anime_id, anime_id)
+        while root != parents[root]:
+            # Path halving
+            parents[root] = parents[parents[root]]
+            root = parents[root]
+        return root
+
+    with open(metadata_path, "r", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            anime_id = int(row["id"])
+            for related in json.loads(row["related_anime"] or "[]"):
+                if related.get("relation_type") in FRANCHISE_RELATION_TYPES:
+                    root, related_root = find(anime_id), find(related["node"]["id"])
+                    if root != related_root:
+                        parents[related_root] = root
+
+    roots = np.array([find(anime_id) for anime_id in corpus_ids], dtype=np.int64)
+    unique_roots, franchise_ids = np.unique(roots, return_inverse=True)
+
+    franchise_of_root = {root: i for i, root in enumerate(unique_roots.tolist())}
+    anime_ids = list(parents)
+    franchise_id_lookup = np.full(max(anime_ids) + 1, -1, dtype=np.int32)
+    franchise_id_lookup[anime_ids] = [
+        franchise_of_root.get(find(anime_id), -1) for anime_id in anime_ids
+    ]
+    return franchise_ids.astype(np.int32), franchise_id_lookup
+
+
+def _build_model(
+    params: dict,
+    corpus_ids: list[int],
+    popularity_distribution: np.ndarray | None,
+    metadata_path: str | None = None,
+) -> RecommenderModel:
+    """Validate the corpus mapping, place params on device and wrap everything up."""
+    corpus_size = CONF["corpus_size"]
+    if len(corpus_ids) != corpus_size:
+        raise ValueError(
+            f"corpus_ids has {len(corpus_ids)} items, expected {corpus_size}"
+        )
+
+    anime_id_to_corpus_idx = {anime_id: idx for idx, anime_id in enumerate(corpus_ids)}
+    # Placed alongside the params below, so ranking doesn't copy it to device per call
+    device_popularity = popularity_distribution
+    corpus_idx_lookup = np.full(max(corpus_ids) + 1, -1, dtype=np.int32)
+    corpus_idx_lookup[corpus_ids] = np.arange(corpus_size, dtype=np.int32)
+
+    media_type_masks, genre_masks = {}, {}
+    franchise_ids = franchise_id_lookup = device_franchise_ids = None
+    if metadata_path and os.path.exists(metadata_path):
+        media_type_masks, genre_masks = load_corpus_masks(metadata_path, corpus_ids)
+        franchise_ids, franchise_id_lookup = build_franchise_ids(
+            metadata_path, corpus_ids
+        )
+        logger.info(f"Grouped corpus into {franchise_ids.max() + 1} franchises")
+        # Placed alongside the params below, like the popularity distribution
+        device_franchise_ids = np.where(
+            _franchise_exempt_mask(media_type_masks, corpus_size), -1, franchise_ids
+        ).astype(np.int32)
+    else:
+        logger.warning(
+            "No metadata available, exclusion and franchise options will be ignored"
+        )
+
+    if popularity_distribution is not None:
+        logger.info(
+            f"Loaded popularity distribution. Min: {popularity_distribution.min():.6f}, Max: {popularity_distribution.max():.6f}, Mean: {popularity_distribution.mean():.6f}"
+        )
+    else:
+        logger.warning(
+            "No popularity distribution available, niche_boost_factor will be disabled"
+        )
+
+    if _INFERENCE_LANES > 1:
+        # Each inference lane replicates the params on its own devices
+        logger.info("Model parameters will be placed per inference lane.")
+    else:
+        # Replicate params across devices if we have multiple CPUs
+        num_devices = get_num_cpu_devices()
+        if num_devices > 1:
+            logger.info(f"Replicating model parameters across {num_devices} devices...")
+        params = _place_params(params, get_sharding_mesh())
+        if num_devices > 1:
+            logger.info("Model parameters replicated.")
+        if popularity_distribution is not None:
+            device_popularity = _place_params(
+                popularity_distribution, get_sharding_mesh()
+            )
+        if device_franchise_ids is not None:
+            device_franchise_ids = _place_params(
+                device_franchise_ids, get_sharding_mesh()
+            )
+
+    logger.info("Model loaded successfully")
+
+    return RecommenderModel(
+        params=params,
+        corpus_ids=corpus_ids,
+        anime_id_to_corpus_idx=anime_id_to_corpus_idx,
+        corpus_size=corpus_size,
+        corpus_idx_lookup=corpus_idx_lookup,
+        corpus_ids_array=np.asarray(corpus_ids, dtype=np.int32),
+        popularity_distribution=popularity_distribution,
+        device_popularity=device_popularity,
+        media_type_masks=media_type_masks,
+        genre_masks=genre_masks,
+        franchise_ids=franchise_ids,
+        franchise_id_lookup=franchise_id_lookup,
+        device_franchise_ids=device_franchise_ids,
+    )
 
 
 def load_model(
@@ -147,49 +1092,17 @@ def load_model(
             f"corpus_ids.json has {len(corpus_ids)} items, expected {corpus_size}"
         )
 
-    anime_id_to_corpus_idx = {anime_id: idx for idx, anime_id in enumerate(corpus_ids)}
-
     # Load metadata for popularity distribution
     popularity_distribution = None
     if metadata_path is None:
         metadata_path = os.environ.get("METADATA_PATH")
 
     if metadata_path and os.path.exists(metadata_path):
-        logger.info(f"Loading metadata from {metadata_path}")
-        import csv
-
-        # Map anime_id to rating_count
-        anime_id_to_rating_count = {}
-        with open(metadata_path, "r", encoding="utf-8") as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                anime_id = int(row["id"])
-                rating_count = int(row["rating_count"])
-                anime_id_to_rating_count[anime_id] = rating_count
-
-        # Build popularity array for corpus items
-        rating_counts = np.zeros(corpus_size, dtype=np.float32)
-        for idx, anime_id in enumerate(corpus_ids):
-            if anime_id in anime_id_to_rating_count:
-                rating_counts[idx] = anime_id_to_rating_count[anime_id]
-            else:
-                logger.warning(f"No metadata found for anime_id {anime_id} in corpus")
-
-        # Normalize to probability distribution (sum to 1.0)
-        total_rating_count = rating_counts.sum()
-        if total_rating_count > 0:
-            popularity_distribution = rating_counts / total_rating_count
-            logger.info(
-                f"Loaded popularity distribution. Min: {popularity_distribution.min():.6f}, Max: {popularity_distribution.max():.6f}, Mean: {popularity_distribution.mean():.6f}"
-            )
-        else:
-            logger.warning(
-                "No valid rating counts found, niche_boost_factor will be disabled"
-            )
-    else:
-        logger.warning(
-            f"Metadata file not found at {metadata_path}, niche_boost_factor will be disabled"
+        popularity_distribution = compute_popularity_distribution(
+            metadata_path, corpus_ids
         )
+    else:
+        logger.warning(f"Metadata file not found at {metadata_path}")
 
     logger.info(f"Loading model from {model_path}")
     model = Recommender()
@@ -202,24 +1115,24 @@ def load_model(
 
     params = serialization.from_bytes(params, saved_bytes)
 
-    # Replicate params across devices if we have multiple CPUs
-    num_devices = get_num_cpu_devices()
-    if num_devices > 1:
-        logger.info(f"Replicating model parameters across {num_devices} devices...")
-        mesh = get_sharding_mesh()
-        # Replicate params (empty tuple for PartitionSpec means replicated on all axes)
-        replicated_sharding = NamedSharding(mesh, P())
-        params = jax.tree.map(lambda x: jax.device_put(x, replicated_sharding), params)
-        logger.info("Model parameters replicated.")
+    return _build_model(params, corpus_ids, popularity_distribution, metadata_path)
 
-    logger.info("Model loaded successfully")
 
-    return RecommenderModel(
-        params=params,
-        corpus_ids=corpus_ids,
-        anime_id_to_corpus_idx=anime_id_to_corpus_idx,
-        corpus_size=corpus_size,
-        popularity_distribution=popularity_distribution,
+def load_model_from_bundle(bundle_path: str) -> RecommenderModel:
+    """
+    Load the model, corpus mapping and popularity distribution from a weight bundle.
+
+    The param tree is built from views into a read-only mapping of the file, so there
+    is no `init` and no intermediate copy of the serialized weights.  Create bundles
+    with `weight_bundle.py`.  Exclusion masks are built from METADATA_PATH, if set.
+    """
+    logger.info(f"Mapping weight bundle from {bundle_path}")
+    bundle = read_weight_bundle(bundle_path)
+    return _build_model(
+        bundle.params,
+        bundle.corpus_ids,
+        bundle.popularity_distribution,
+        os.environ.get("METADATA_PATH"),
     )
 
 
@@ -227,135 +1140,898 @@ def get_model() -> RecommenderModel:
     """Get the loaded model, initializing if necessary."""
     global _model
     if _model is None:
-        model_path = os.environ.get("MODEL_PATH", "/opt/model/jax_model.msgpack")
-        corpus_path = os.environ.get("CORPUS_PATH", "/opt/model/corpus_ids.json")
-        _model = load_model(model_path, corpus_path)
+        bundle_path = os.environ.get("MODEL_BUNDLE_PATH")
+        if bundle_path and os.path.exists(bundle_path):
+            _model = load_model_from_bundle(bundle_path)
+        else:
+            model_path = os.environ.get("MODEL_PATH", "/opt/model/jax_model.msgpack")
+            corpus_path = os.environ.get("CORPUS_PATH", "/opt/model/corpus_ids.json")
+            _model = load_model(model_path, corpus_path)
     return _model
 
 
-def preprocess_profile(
-    model: RecommenderModel, user_profile: list[UserAnimeEntry]
-) -> tuple[np.ndarray, np.ndarray, np.ndarray, list[dict], dict]:
+def compute_response_checksum(model: RecommenderModel) -> bytes:
     """
-    Preprocess user profile into model input format.
+    Digest of everything that determines the server's responses: the weights (see
+    `compute_weights_checksum`) and the corpus masks and franchise groups built from
+    METADATA_PATH.
 
     Returns:
-        - corpus_indices: indices into the corpus for valid entries
-        - normalized_ratings: normalized rating values
-        - original_ratings: original 0-10 ratings
-        - valid_entries: list of valid entry dicts with corpus_idx added
-        - norm_stats: normalization statistics
+        16-byte blake2b digest
     """
-    valid_entries = []
-    for entry in user_profile:
-        anime_id = entry["anime_id"]
-        if anime_id not in model.anime_id_to_corpus_idx:
-            continue
+    digest = hashlib.blake2b(
+        compute_weights_checksum(
+            model.params, model.corpus_ids, model.popularity_distribution
+        ),
+        digest_size=16,
+    )
+    for name, masks in (
+        ("media_type", model.media_type_masks),
+        ("genre", model.genre_masks),
+    ):
+        for key in sorted(masks):
+            digest.update(json.dumps([name, key]).encode("utf-8"))
+            digest.update(np.packbits(masks[key]).tobytes())
+    if model.franchise_ids is not None:
+        for array in (model.franchise_ids, model.franchise_id_lookup):
+            digest.update(np.ascontiguousarray(array, dtype="<i4").tobytes())
+    return digest.digest()
 
-        rating = entry.get("rating", 0) or 0
-        watch_status = entry.get("watch_status", "")
 
-        if rating > 0 or watch_status in ("completed", "watching", "dropped"):
-            valid_entries.append(
-                {
-                    "corpus_idx": model.anime_id_to_corpus_idx[anime_id],
-                    "anime_id": anime_id,
-                    "rating": rating,
-                    "watch_status": watch_status,
-                }
-            )
+@dataclass
+class InferenceLane:
+    """A slice of the CPU devices with its own copy of the params and its own executor."""
 
-    if not valid_entries:
-        raise ValueError("No valid entries in user profile")
+    index: int
+    # Same as the global model, except for `params` and `mesh`
+    model: RecommenderModel
+    # Single-thread executor to serialize inference on the lane (JAX uses all of the
+    # lane's devices internally)
+    executor: ThreadPoolExecutor
+    # Estimated cost of the jobs queued or running on the lane
+    outstanding_cost: float = 0.0
+    jobs_run: int = 0
 
-    valid_entries.sort(key=lambda x: x["corpus_idx"])
 
-    corpus_indices = np.array([e["corpus_idx"] for e in valid_entries], dtype=np.int32)
-    original_ratings = np.array(
-        [
-            (
-                -2
-                if e.get("watch_status") == "dropped" and e.get("rating", 0) == 0
-                else e["rating"]
-            )
-            for e in valid_entries
-        ],
-        dtype=np.float32,
-    )
+class InferenceLanes:
+    """
+    Partitions the CPU devices into inference lanes and routes jobs between them.
 
-    normalized_ratings, norm_stats = normalize_ratings(original_ratings)
+    Jobs on the same lane run one at a time, while different lanes run concurrently.
+    Each job goes to the lane with the least outstanding estimated cost.  With more than
+    one lane, heavy jobs (holdout and contribution analysis of long profiles) are kept
+    off lane 0, so cheap requests never queue behind them.
+    """
 
-    return (
-        corpus_indices,
-        normalized_ratings,
-        original_ratings,
-        valid_entries,
-        norm_stats,
-    )
+    def __init__(self, num_lanes: int = 1, heavy_cost: float = 16):
+        self.num_lanes = num_lanes
+        self.heavy_cost = heavy_cost
+        self.lanes: list[InferenceLane] = []
 
+    def configure(self, model: RecommenderModel) -> None:
+        """Split the devices between lanes and place a copy of the params on each."""
+        num_lanes = min(self.num_lanes, get_num_cpu_devices())
+        if num_lanes < self.num_lanes:
+            logger.warning(
+                f"Only {num_lanes} CPU devices available, using {num_lanes} inference lanes"
+            )
+        if num_lanes == 1:
+            self.lanes = [InferenceLane(0, model, ThreadPoolExecutor(max_workers=1))]
+            return
+
+        lanes = []
+        for index, devices in enumerate(partition_devices(num_lanes)):
+            mesh = get_sharding_mesh(devices)
+            logger.info(f"Placing model parameters for lane {index} on {devices}")
+            lane_model = replace(
+                model,
+                params=_place_params(model.params, mesh),
+                device_popularity=(
+                    None
+                    if model.popularity_distribution is None
+                    else _place_params(model.popularity_distribution, mesh)
+                ),
+                # Still on the host, since params aren't placed when there are lanes
+                device_franchise_ids=(
+                    None
+                    if model.device_franchise_ids is None
+                    else _place_params(model.device_franchise_ids, mesh)
+                ),
+                mesh=mesh,
+            )
+            executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix=f"inference-lane-{index}"
+            )
+            lanes.append(InferenceLane(index, lane_model, executor))
+        self.lanes = lanes
+
+    def _pick_lane(self, cost: float) -> InferenceLane:
+        if not self.lanes:
+            self.configure(get_model())
+        candidates = self.lanes
+        if cost > self.heavy_cost and len(self.lanes) > 1:
+            candidates = self.lanes[1:]
+        # Ties go to the lowest-numbered lane
+        return min(candidates, key=lambda lane: lane.outstanding_cost)
+
+    async def run(self, fn, *args, cost: float = 1):
+        """
+        Run `fn(lane_model, *args)` on a lane's executor.
 
-def get_recommendations_simple(
-    model: RecommenderModel,
-    corpus_indices: np.ndarray,
-    normalized_ratings: np.ndarray,
-    top_k: int,
-    logit_weight: float | None,
+        Args:
+            fn: Function taking the lane's `RecommenderModel` as its first argument
+            cost: Estimated cost of the job in forward passes (see `estimate_inference_cost`)
+        """
+        lane = self._pick_lane(cost)
+        lane.outstanding_cost += cost
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                lane.executor, fn, lane.model, *args
+            )
+        finally:
+            lane.outstanding_cost -= cost
+            lane.jobs_run += 1
+
+    async def run_on_each_lane(self, fn, *args) -> list:
+        """Run `fn(lane_model, *args)` on every lane concurrently."""
+        if not self.lanes:
+            self.configure(get_model())
+        loop = asyncio.get_running_loop()
+        return await asyncio.gather(
+            *[
+                loop.run_in_executor(lane.executor, fn, lane.model, *args)
+                for lane in self.lanes
+            ]
+        )
+
+    def stats(self) -> list[dict]:
+        return [
+            {
+                "lane": lane.index,
+                "num_devices": lane.model.num_devices,
+                "outstanding_cost": lane.outstanding_cost,
+                "jobs_run": lane.jobs_run,
+            }
+            for lane in self.lanes
+        ]
+
+
+def estimate_inference_cost(
+    n_items: int, include_contribution_analysis: bool, include_profile_holdout: bool
+) -> float:
+    """
+    Estimate the cost of a request in forward passes.
+
+    Recommendations take one pass.  Contribution and holdout analysis each run a batch
+    with one row per profile item.
+    """
+    num_holdout_analyses = int(include_contribution_analysis) + int(
+        include_profile_holdout
+    )
+    return 1 + num_holdout_analyses * n_items
+
+
+_lanes = InferenceLanes(_INFERENCE_LANES, heavy_cost=_INFERENCE_LANE_HEAVY_COST)
+
+
+def preprocess_profile(
+    model: RecommenderModel, user_profile: list[UserAnimeEntry]
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, dict]:
+    """Preprocess a profile given as a list of entries (see `preprocess_profile_columns`)."""
+    return preprocess_profile_columns(
+        model,
+        np.array([entry["anime_id"] for entry in user_profile], dtype=np.int64),
+        np.array(
+            [entry.get("rating", 0) or 0 for entry in user_profile], dtype=np.float32
+        ),
+        encode_watch_statuses(
+            [entry.get("watch_status", "") for entry in user_profile]
+        ),
+    )
+
+
+def _select_profile_entries(
+    model: RecommenderModel,
+    anime_ids: np.ndarray,
+    ratings: np.ndarray,
+    watch_status_codes: np.ndarray,
+    profile_ids: np.ndarray,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Filter, sort and deduplicate the entries of one or more concatenated profiles.
+
+    Entries are dropped if the anime isn't in the corpus, or if it's unrated and the
+    watch status doesn't count as watched.  What's left is sorted by profile and then on
+    everything that reaches the model, so that the result (and cache key) doesn't depend
+    on the order of the profile.  If an anime appears more than once in a profile, the
+    entry with the highest rating is kept.
+
+    Args:
+        profile_ids: (n,) index of the profile each entry belongs to
+
+    Returns:
+        (profile_ids, corpus_indices, original_ratings) of the remaining entries, with
+        the ratings of unrated dropped anime set to -2
+    """
+    anime_ids = np.asarray(anime_ids, dtype=np.int64)
+    ratings = np.asarray(ratings, dtype=np.float32)
+    watch_status_codes = np.asarray(watch_status_codes, dtype=np.uint8)
+
+    lookup = model.corpus_idx_lookup
+    in_range = (anime_ids >= 0) & (anime_ids < len(lookup))
+    corpus_indices = np.where(in_range, lookup[np.where(in_range, anime_ids, 0)], -1)
+    valid = (corpus_indices >= 0) & (
+        (ratings > 0) | np.isin(watch_status_codes, _WATCHED_STATUS_CODES)
+    )
+    valid = np.flatnonzero(valid)
+
+    order = valid[
+        np.lexsort(
+            (
+                watch_status_codes[valid],
+                ratings[valid],
+                corpus_indices[valid],
+                profile_ids[valid],
+            )
+        )
+    ]
+    profile_ids = profile_ids[order]
+    corpus_indices = corpus_indices[order].astype(np.int32)
+    ratings = ratings[order]
+    watch_status_codes = watch_status_codes[order]
+
+    # Duplicates are adjacent after sorting, and the last of each run rates highest
+    keep = np.ones(len(order), dtype=bool)
+    keep[:-1] = (profile_ids[1:] != profile_ids[:-1]) | (
+        corpus_indices[1:] != corpus_indices[:-1]
+    )
+
+    dropped = watch_status_codes[keep] == WATCH_STATUS_CODES["dropped"]
+    ratings = ratings[keep]
+    original_ratings = np.where(dropped & (ratings == 0), np.float32(-2), ratings)
+    return profile_ids[keep], corpus_indices[keep], original_ratings
+
+
+def preprocess_profile_columns(
+    model: RecommenderModel,
+    anime_ids: np.ndarray,
+    ratings: np.ndarray,
+    watch_status_codes: np.ndarray,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, dict]:
+    """
+    Preprocess a profile given as parallel arrays into model input format.
+
+    Args:
+        model: Loaded model
+        anime_ids: (n,) anime IDs
+        ratings: (n,) 0-10 ratings, 0 meaning unrated
+        watch_status_codes: (n,) watch status codes (see WATCH_STATUSES)
+
+    Returns:
+        - corpus_indices: indices into the corpus for valid entries
+        - normalized_ratings: normalized rating values
+        - original_ratings: original 0-10 ratings
+        - norm_stats: normalization statistics
+    """
+    _, corpus_indices, original_ratings = _select_profile_entries(
+        model,
+        anime_ids,
+        ratings,
+        watch_status_codes,
+        np.zeros(len(anime_ids), dtype=np.int64),
+    )
+    if len(corpus_indices) == 0:
+        raise ValueError("No valid entries in user profile")
+
+    normalized_ratings, norm_stats = normalize_ratings(original_ratings)
+
+    return corpus_indices, normalized_ratings, original_ratings, norm_stats
+
+
+def preprocess_profile_batch(
+    model: RecommenderModel,
+    anime_ids: np.ndarray,
+    ratings: np.ndarray,
+    watch_status_codes: np.ndarray,
+    offsets: np.ndarray,
+) -> list[tuple[np.ndarray, np.ndarray, np.ndarray, dict] | None]:
+    """
+    Preprocess many profiles in one pass.
+
+    Profiles are concatenated: profile i is entries `offsets[i]:offsets[i + 1]` of the
+    column arrays, which are as for `preprocess_profile_columns`.
+
+    Returns:
+        For each profile, the tuple `preprocess_profile_columns` would return, or None
+        if the profile has no valid entries
+    """
+    offsets = np.asarray(offsets, dtype=np.int64)
+    num_profiles = len(offsets) - 1
+    profile_ids = np.repeat(np.arange(num_profiles), np.diff(offsets))
+    profile_ids, corpus_indices, original_ratings = _select_profile_entries(
+        model, anime_ids, ratings, watch_status_codes, profile_ids
+    )
+
+    bounds = np.searchsorted(profile_ids, np.arange(num_profiles + 1))
+    normalized_ratings, batch_stats = normalize_ratings_batch(original_ratings, bounds)
+    results = []
+    for i, (start, end) in enumerate(zip(bounds[:-1], bounds[1:])):
+        if start == end:
+            results.append(None)
+            continue
+        norm_stats = {
+            "mu": float(batch_stats["mu"][i]),
+            "sigma": float(batch_stats["sigma"][i]),
+            "alpha": float(batch_stats["alpha"][i]),
+            "zscore_norm": batch_stats["zscore_norm"][start:end],
+            "absolute_norm": batch_stats["absolute_norm"][start:end],
+        }
+        results.append(
+            (
+                corpus_indices[start:end],
+                normalized_ratings[start:end],
+                original_ratings[start:end],
+                norm_stats,
+            )
+        )
+    return results
+
+
+def build_exclusion_mask(
+    model: RecommenderModel,
+    excluded_anime_ids: list[int],
+    excluded_genre_ids: list[int],
+    excluded_media_types: list[str],
+    included_media_types: list[str] = [],
+) -> np.ndarray | None:
+    """
+    Resolve a request's exclusion options into a mask over the corpus.
+
+    IDs and media types that aren't in the corpus metadata exclude nothing.  A non-empty
+    `included_media_types` excludes every item with any other media type, including
+    ones the client doesn't know about.
+
+    Returns:
+        (corpus_size,) bool array with the excluded items set, or None if the request
+        doesn't exclude anything
+    """
+    masks = [
+        model.media_type_masks[media_type]
+        for media_type in excluded_media_types
+        if media_type in model.media_type_masks
+    ] + [
+        model.genre_masks[genre_id]
+        for genre_id in excluded_genre_ids
+        if genre_id in model.genre_masks
+    ]
+    if included_media_types and model.media_type_masks:
+        masks.extend(
+            mask
+            for media_type, mask in model.media_type_masks.items()
+            if media_type not in included_media_types
+        )
+    anime_ids = np.asarray(excluded_anime_ids, dtype=np.int64)
+    lookup = model.corpus_idx_lookup
+    corpus_indices = lookup[anime_ids[(anime_ids >= 0) & (anime_ids < len(lookup))]]
+    corpus_indices = corpus_indices[corpus_indices >= 0]
+    if not masks and len(corpus_indices) == 0:
+        return None
+
+    excluded_mask = np.zeros(model.corpus_size, dtype=bool)
+    for mask in masks:
+        excluded_mask |= mask
+    excluded_mask[corpus_indices] = True
+    return excluded_mask
+
+
+def _franchise_exempt_mask(
+    media_type_masks: dict[str, np.ndarray], corpus_size: int
+) -> np.ndarray:
+    """(corpus_size,) bool mask of the items franchise collapsing leaves alone."""
+    exempt = np.zeros(corpus_size, dtype=bool)
+    for media_type in _FRANCHISE_EXEMPT_MEDIA_TYPES:
+        if media_type in media_type_masks:
+            exempt |= media_type_masks[media_type]
+    return exempt
+
+
+def exclude_profile_franchises(
+    model: RecommenderModel,
+    excluded_mask: np.ndarray | None,
+    corpus_indices: np.ndarray,
+    seed_anime_ids: list[int] = [],
+) -> np.ndarray | None:
+    """
+    Add the franchises a profile already has an entry in to an exclusion mask, for
+    `collapse_franchises`.
+
+    Besides the profile's corpus items, franchises are taken from `seed_anime_ids`,
+    which can include anime that aren't in the corpus or didn't make it into the
+    preprocessed profile.  Items that franchise collapsing doesn't apply to (movies,
+    specials etc.) are kept.
+
+    Returns:
+        A new mask, or `excluded_mask` if there is no franchise data
+    """
+    if model.franchise_ids is None:
+        return excluded_mask
+
+    in_profile = np.zeros(model.franchise_ids.max() + 1, dtype=bool)
+    in_profile[model.franchise_ids[corpus_indices]] = True
+    anime_ids = np.asarray(seed_anime_ids, dtype=np.int64)
+    lookup = model.franchise_id_lookup
+    seed_franchise_ids = lookup[anime_ids[(anime_ids >= 0) & (anime_ids < len(lookup))]]
+    in_profile[seed_franchise_ids[seed_franchise_ids >= 0]] = True
+    franchise_mask = in_profile[model.franchise_ids] & ~_franchise_exempt_mask(
+        model.media_type_masks, model.corpus_size
+    )
+    if excluded_mask is None:
+        return franchise_mask
+    return excluded_mask | franchise_mask
+
+
+def get_recommendations_simple(
+    model: RecommenderModel,
+    corpus_indices: np.ndarray,
+    normalized_ratings: np.ndarray,
+    top_k: int,
+    logit_weight: float | None,
     use_alt_ranking: bool = False,
-) -> list[dict]:
+    niche_boost_factor: float = 0.0,
+    excluded_mask: np.ndarray | None = None,
+    collapse_franchises: bool = False,
+) -> Recommendations:
     """Get recommendations without any holdout analysis."""
-    input_vector = make_dense_profile(corpus_indices, normalized_ratings)
-    item_logits, rating_pred = infer_outputs(model.params, input_vector)
+    outputs = get_profile_outputs(model, corpus_indices, normalized_ratings)
+    return rank_profile_outputs(
+        model,
+        outputs,
+        corpus_indices,
+        top_k,
+        logit_weight,
+        use_alt_ranking,
+        niche_boost_factor,
+        excluded_mask,
+        collapse_franchises,
+    )
 
-    presence_mask = input_vector[0, : model.corpus_size]
+
+def rank_profile_outputs(
+    model: RecommenderModel,
+    outputs: ProfileOutputs,
+    corpus_indices: np.ndarray,
+    top_k: int,
+    logit_weight: float | None,
+    use_alt_ranking: bool = False,
+    niche_boost_factor: float = 0.0,
+    excluded_mask: np.ndarray | None = None,
+    collapse_franchises: bool = False,
+) -> Recommendations:
+    """
+    Rank a profile's model outputs, excluding items already in the profile and any
+    set in `excluded_mask` (see `build_exclusion_mask`).  With `collapse_franchises`,
+    only the best-scoring item of each franchise is kept.
+    """
+    already_rated_mask = np.zeros(model.corpus_size, dtype=np.float32)
+    already_rated_mask[corpus_indices] = 1.0
+    if excluded_mask is not None:
+        already_rated_mask[excluded_mask] = 1.0
     topk_idx, topk_scores, topk_probs, topk_ratings = rank_by_weighted_score(
-        item_logits[0],
-        rating_pred[0],
-        presence_mask,
+        outputs.item_logits,
+        outputs.rating_pred,
+        already_rated_mask,
         k=top_k,
         logit_weight=logit_weight,
         use_alt_ranking=use_alt_ranking,
+        popularity=model.device_popularity,
+        niche_boost=effective_niche_boost(niche_boost_factor),
+        franchise_ids=model.device_franchise_ids,
+        collapse_franchises=collapse_franchises,
     )
 
-    recommendations = []
-    for i in range(len(topk_idx)):
-        corpus_idx = int(topk_idx[i])
-        recommendations.append(
-            {
-                "anime_id": model.corpus_ids[corpus_idx],
-                "corpus_idx": corpus_idx,
-                "score": float(topk_scores[i]),
-                "probability": float(topk_probs[i]),
-                "predicted_rating": float(topk_ratings[i]),
-            }
+    return build_recommendations(model, topk_idx, topk_scores, topk_probs, topk_ratings)
+
+
+def _place_outputs(model: RecommenderModel, outputs: ProfileOutputs) -> ProfileOutputs:
+    """
+    Commit a profile's outputs to the devices `model`'s params are on, so the kernels
+    that use them run on the model's inference lane rather than the default device.
+    Outputs cached by another lane, or as host arrays, are copied over.
+    """
+    mesh = get_sharding_mesh() if model.mesh is None else model.mesh
+    item_logits, rating_pred = jax.device_put(
+        (outputs.item_logits, outputs.rating_pred), NamedSharding(mesh, P())
+    )
+    holdout_item_logits, holdout_rating_pred = (
+        outputs.holdout_item_logits,
+        outputs.holdout_rating_pred,
+    )
+    if holdout_item_logits is not None:
+        # Sharded by row, as `batch_holdout_predict_padded` returns them
+        holdout_item_logits, holdout_rating_pred = jax.device_put(
+            (holdout_item_logits, holdout_rating_pred),
+            NamedSharding(mesh, P("batch", None)),
         )
+    return ProfileOutputs(
+        item_logits=item_logits,
+        rating_pred=rating_pred,
+        holdout_item_logits=holdout_item_logits,
+        holdout_rating_pred=holdout_rating_pred,
+    )
+
+
+def get_profile_outputs(
+    model: RecommenderModel,
+    corpus_indices: np.ndarray,
+    normalized_ratings: np.ndarray,
+) -> ProfileOutputs:
+    """
+    Get the model outputs for a profile from the output cache, running the model on a
+    miss.  The outputs are on `model`'s devices (see `_place_outputs`).
+    """
+    outputs = _output_cache.get(corpus_indices, normalized_ratings)
+    if outputs is None:
+        # Kept on device, so ranking only transfers the top k back to the host
+        item_logits, rating_pred = infer_outputs_sparse(
+            model.params, corpus_indices, normalized_ratings
+        )
+        outputs = ProfileOutputs(item_logits=item_logits[0], rating_pred=rating_pred[0])
+        outputs = _place_outputs(model, outputs)
+        _output_cache.put(corpus_indices, normalized_ratings, outputs)
+        return outputs
+    return _place_outputs(model, outputs)
+
 
-    return recommendations
+def get_profile_holdout_outputs(
+    model: RecommenderModel,
+    corpus_indices: np.ndarray,
+    normalized_ratings: np.ndarray,
+) -> tuple[jax.Array, jax.Array]:
+    """
+    Get the padded holdout outputs (see `batch_holdout_predict_padded`) for a profile,
+    from the output cache if they were computed before.
+    """
+    outputs = get_profile_outputs(model, corpus_indices, normalized_ratings)
+    if outputs.holdout_item_logits is None:
+        # Left on device, sharded across the lane's devices like the kernels using them
+        outputs.holdout_item_logits, outputs.holdout_rating_pred = (
+            batch_holdout_predict_padded(
+                model.params,
+                corpus_indices,
+                normalized_ratings,
+                model.corpus_size,
+                mesh=model.mesh,
+            )
+        )
+        outputs = _place_outputs(model, outputs)
+        # Re-store to account for the entry's new size
+        _output_cache.put(corpus_indices, normalized_ratings, outputs)
+    return outputs.holdout_item_logits, outputs.holdout_rating_pred
 
 
-def apply_niche_boost(
-    recommendations: list[dict],
+def build_recommendations(
     model: RecommenderModel,
-    niche_boost_factor: float,
-) -> list[dict]:
+    topk_idx: np.ndarray,
+    topk_scores: np.ndarray,
+    topk_probs: np.ndarray,
+    topk_ratings: np.ndarray,
+) -> Recommendations:
+    """Wrap top-k arrays up as `Recommendations`."""
+    return Recommendations(
+        corpus_indices=topk_idx,
+        anime_ids=model.corpus_ids_array[topk_idx],
+        scores=topk_scores,
+        probabilities=topk_probs,
+        predicted_ratings=topk_ratings,
+    )
+
+
+@dataclass
+class _BatchedRecommendJob:
+    corpus_indices: np.ndarray
+    normalized_ratings: np.ndarray
+    top_k: int
+    logit_weight: float
+    use_alt_ranking: bool
+    niche_boost_factor: float
+    # (corpus_size,) bool mask of items to leave out, see `build_exclusion_mask`
+    excluded_mask: np.ndarray | None
+    collapse_franchises: bool
+    future: asyncio.Future | None
+
+
+def _run_batched_recommendations(
+    model: RecommenderModel, jobs: list[_BatchedRecommendJob]
+) -> list[Recommendations]:
+    """
+    Run `get_recommendations_simple` for many profiles as one batched forward pass
+    (called in executor to serialize access).
+    """
+    results: list[Recommendations | None] = [None] * len(jobs)
+
+    # Profiles with cached outputs only need ranking
+    uncached = []
+    for i, job in enumerate(jobs):
+        outputs = _output_cache.get(job.corpus_indices, job.normalized_ratings)
+        if outputs is None:
+            uncached.append(i)
+        else:
+            results[i] = rank_profile_outputs(
+                model,
+                _place_outputs(model, outputs),
+                job.corpus_indices,
+                job.top_k,
+                job.logit_weight,
+                job.use_alt_ranking,
+                job.niche_boost_factor,
+                job.excluded_mask,
+                job.collapse_franchises,
+            )
+    if not uncached:
+        return results
+
+    group = [jobs[i] for i in uncached]
+    # Pad the batch to a power of two with empty profiles to bound the number of compiled
+    # shapes, and to a multiple of the number of devices so it can be split between them
+    num_devices = model.num_devices
+    padded_size = 1 << (len(group) - 1).bit_length()
+    padded_size = -(-padded_size // num_devices) * num_devices
+    empty_profile = (np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float32))
+    idxs, vals = pad_sparse_profiles(
+        [(job.corpus_indices, job.normalized_ratings) for job in group]
+        + [empty_profile] * (padded_size - len(group))
+    )
+    logit_weights = np.zeros(padded_size, dtype=np.float32)
+    logit_weights[: len(group)] = [job.logit_weight for job in group]
+    niche_boosts = np.zeros(padded_size, dtype=np.float32)
+    niche_boosts[: len(group)] = [
+        effective_niche_boost(job.niche_boost_factor) for job in group
+    ]
+    collapse_franchises = np.zeros(padded_size, dtype=bool)
+    collapse_franchises[: len(group)] = [job.collapse_franchises for job in group]
+    # Always passed, even if nothing is excluded, so there's one compiled version
+    excluded_bits = np.zeros((padded_size, -(-model.corpus_size // 8)), dtype=np.uint8)
+    for row, job in enumerate(group):
+        if job.excluded_mask is not None:
+            excluded_bits[row] = np.packbits(job.excluded_mask)
+
+    if num_devices > 1:
+        # Shard the batch dimension so each device runs its share of the profiles
+        mesh = get_sharding_mesh() if model.mesh is None else model.mesh
+        idxs, vals, excluded_bits = jax.device_put(
+            (idxs, vals, excluded_bits), NamedSharding(mesh, P("batch", None))
+        )
+
+    item_logits, rating_pred = batch_infer_outputs_sparse(model.params, idxs, vals)
+
+    # Every profile gets the largest requested k; top-k results are sorted so
+    # each job just takes its own prefix
+    k = min(max(job.top_k for job in group), model.corpus_size)
+    # `use_alt_ranking` is a compile-time flag, so each setting is ranked separately
+    for use_alt_ranking in sorted({job.use_alt_ranking for job in group}):
+        topk_idx, topk_scores, topk_probs, topk_ratings = jax.device_get(
+            batch_rank_top_k(
+                item_logits,
+                rating_pred,
+                idxs,
+                logit_weights,
+                k=k,
+                use_alt_ranking=use_alt_ranking,
+                popularity=model.device_popularity,
+                niche_boost=niche_boosts,
+                excluded_bits=excluded_bits,
+                franchise_ids=model.device_franchise_ids,
+                collapse_franchises=collapse_franchises,
+            )
+        )
+
+        for row, (i, job) in enumerate(zip(uncached, group)):
+            if job.use_alt_ranking != use_alt_ranking:
+                continue
+            results[i] = build_recommendations(
+                model,
+                topk_idx[row, : job.top_k],
+                topk_scores[row, : job.top_k],
+                topk_probs[row, : job.top_k],
+                topk_ratings[row, : job.top_k],
+            )
+
+    # Cached as host rows, since slicing them on device would compile per batch shape;
+    # they're committed to a lane's devices when used (see `_place_outputs`)
+    item_logits, rating_pred = jax.device_get((item_logits, rating_pred))
+    for row, job in enumerate(group):
+        _output_cache.put(
+            job.corpus_indices,
+            job.normalized_ratings,
+            # Copy so each entry doesn't keep the whole batch alive
+            ProfileOutputs(
+                item_logits=item_logits[row].copy(),
+                rating_pred=rating_pred[row].copy(),
+            ),
+        )
+
+    return results
+
+
+class RecommendationBatcher:
+    """
+    Collects concurrent simple-path requests and runs them as one batched forward pass.
+
+    Requests are collected until `max_batch_size` are queued or `max_wait_ms` has elapsed
+    since the first one arrived, whichever comes first.
+    """
+
+    def __init__(
+        self,
+        max_batch_size: int = 32,
+        max_wait_ms: float = 2.0,
+        max_concurrent_batches: int = 1,
+    ):
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        # Up to one batch per inference lane can run at a time
+        self.max_concurrent_batches = max_concurrent_batches
+        self.queue: asyncio.Queue[_BatchedRecommendJob] | None = None
+        self._worker: asyncio.Task | None = None
+        self._batch_slots: asyncio.Semaphore | None = None
+        self._running_batches: set[asyncio.Task] = set()
+        self.batches_run = 0
+        self.requests_batched = 0
+
+    def start(self) -> None:
+        """Start the background worker.  Must be called from the running event loop."""
+        if self._worker is None:
+            self.queue = asyncio.Queue()
+            self._batch_slots = asyncio.Semaphore(self.max_concurrent_batches)
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._worker is not None:
+            for task in [self._worker, *self._running_batches]:
+                task.cancel()
+            await asyncio.gather(
+                self._worker, *self._running_batches, return_exceptions=True
+            )
+            self._worker = None
+
+    async def submit(
+        self,
+        model: RecommenderModel,
+        corpus_indices: np.ndarray,
+        normalized_ratings: np.ndarray,
+        top_k: int,
+        logit_weight: float | None,
+        use_alt_ranking: bool = False,
+        niche_boost_factor: float = 0.0,
+        excluded_mask: np.ndarray | None = None,
+        collapse_franchises: bool = False,
+    ) -> Recommendations:
+        """Queue a profile for batched inference and wait for its recommendations."""
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put(
+            _BatchedRecommendJob(
+                corpus_indices=corpus_indices,
+                normalized_ratings=normalized_ratings,
+                top_k=top_k,
+                logit_weight=(
+                    CONF["rec_logit_weight"] if logit_weight is None else logit_weight
+                ),
+                use_alt_ranking=use_alt_ranking,
+                niche_boost_factor=niche_boost_factor,
+                excluded_mask=excluded_mask,
+                collapse_franchises=collapse_franchises,
+                future=future,
+            )
+        )
+        return await future
+
+    async def _collect_batch(self) -> list[_BatchedRecommendJob]:
+        loop = asyncio.get_running_loop()
+        batch = [await self.queue.get()]
+        deadline = loop.time() + self.max_wait_ms / 1000
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        # Anything that queued up while waiting on the previous batch joins this one
+        while len(batch) < self.max_batch_size and not self.queue.empty():
+            batch.append(self.queue.get_nowait())
+        return batch
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            # Wait for a free slot before collecting, so requests that arrive while every
+            # slot is busy join the next batch
+            await self._batch_slots.acquire()
+            batch = await self._collect_batch()
+            task = loop.create_task(self._run_batch(batch))
+            self._running_batches.add(task)
+            task.add_done_callback(self._on_batch_done)
+
+    def _on_batch_done(self, task: asyncio.Task) -> None:
+        self._running_batches.discard(task)
+        self._batch_slots.release()
+
+    async def _run_batch(self, batch: list[_BatchedRecommendJob]) -> None:
+        try:
+            # A batch is a single forward pass no matter how many profiles it holds
+            results = await _lanes.run(_run_batched_recommendations, batch, cost=1)
+        except Exception as e:
+            logger.exception("Error running batched inference")
+            for job in batch:
+                if not job.future.done():
+                    job.future.set_exception(e)
+            return
+
+        self.batches_run += 1
+        self.requests_batched += len(batch)
+        for job, recommendations in zip(batch, results):
+            if not job.future.done():
+                job.future.set_result(recommendations)
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into a single execution."""
+
+    def __init__(self):
+        self._in_flight: dict[bytes, asyncio.Task] = {}
+        self.coalesced = 0
+
+    async def run(self, key: bytes, fn):
+        """Await `fn()`, or the result of an identical call that is already running."""
+        task = self._in_flight.get(key)
+        if task is None:
+            # A task of its own, so the call isn't tied to the request that started it
+            task = asyncio.get_running_loop().create_task(fn())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda task: self._finish(key, task))
+        else:
+            self.coalesced += 1
+        # Shield so that any one caller being cancelled, including the one that started
+        # it, doesn't cancel the shared call
+        return await asyncio.shield(task)
+
+    def _finish(self, key: bytes, task: asyncio.Task) -> None:
+        del self._in_flight[key]
+        # Mark any exception as retrieved, in case every caller was cancelled
+        task.cancelled() or task.exception()
+
+    def __len__(self) -> int:
+        return len(self._in_flight)
+
+
+# `/recommend` requests currently computing, by cache key
+_in_flight = SingleFlight()
+
+_batcher = RecommendationBatcher(
+    max_batch_size=_INFERENCE_MAX_BATCH_SIZE,
+    max_wait_ms=_INFERENCE_BATCH_WINDOW_MS,
+    max_concurrent_batches=_INFERENCE_LANES,
+)
+
+
+def effective_niche_boost(niche_boost_factor: float) -> float:
     """
-    Apply niche boost to recommendation scores based on model probability vs. popularity.
+    Map the `niche_boost_factor` request option to the boost strength used for ranking.
 
     The niche boost rewards items where the model's predicted probability is higher than
-    expected given the item's global popularity. This helps surface niche items that are
-    particularly well-suited for the user, even if they have low overall popularity.
+    expected given the item's global popularity (see `niche_boost_multiplier`).  This
+    helps surface niche items that are particularly well-suited for the user, even if
+    they have low overall popularity.  It is applied to the scores of the whole corpus
+    before top-k selection.
 
     Args:
-        recommendations: List of recommendation dicts with 'corpus_idx', 'score', and 'probability'
-        model: RecommenderModel with popularity_distribution
         niche_boost_factor: Float in [0, 1] controlling boost strength (0 = no boost)
 
     Returns:
-        Updated list of recommendations with adjusted scores, sorted by new scores
+        Boost strength, 0 if disabled
     """
-    if niche_boost_factor <= 0 or model.popularity_distribution is None:
-        # No boost or no popularity data
-        return recommendations
-
     # Clamp niche_boost_factor to [0, 1]
     niche_boost_factor = max(0.0, min(1.0, niche_boost_factor))
 
@@ -367,51 +2043,12 @@ def apply_niche_boost(
     #   f(x) = 0.5 + (x - 0.5) * exp(k*(x-0.5))   for x > 0.5
     # Where k controls the exponential growth rate
     if niche_boost_factor <= 0.5:
-        effective_boost = niche_boost_factor
-    else:
-        # Exponential scaling for values above 0.5
-        # k=3 gives good exponential growth: f(0.5)=0.5, f(1.0)≈1.32
-        k = 4.62
-        excess = niche_boost_factor - 0.5
-        effective_boost = 0.5 + excess * np.exp(k * excess)
-
-    # Apply boost
-    for rec in recommendations:
-        corpus_idx = rec["corpus_idx"]
-        model_prob = rec["probability"]
-        popularity = model.popularity_distribution[corpus_idx]
-
-        # Compute "surprise factor": how much more the model likes this vs. its popularity
-        # Add small epsilon to avoid division by zero
-        epsilon = 1e-9
-        surprise_ratio = model_prob / (popularity + epsilon)
-
-        # Convert surprise ratio to a boost multiplier
-        # Use log to compress the range (surprise_ratio can be very large for niche items)
-        # Apply effective_boost to control the strength
-        # Formula: boost = 1 + effective_boost * log(1 + surprise_ratio)
-        # This gives boost >= 1.0, with higher values for higher surprise
-        log_surprise = np.log1p(surprise_ratio)  # log(1 + x)
-        boost_multiplier = 1.0 + effective_boost * log_surprise
-
-        # Apply boost to the score
-        original_score = rec["score"]
-        boosted_score = original_score * boost_multiplier
-        logger.info(
-            f"Niche boost applied to anime_id {rec['anime_id']}: "
-            f"original_score={original_score:.4f}, "
-            f"model_prob={model_prob:.6f}, "
-            f"popularity={popularity:.6f}, "
-            f"surprise_ratio={surprise_ratio:.4f}, "
-            f"boost_multiplier={boost_multiplier:.4f}, "
-            f"boosted_score={boosted_score:.4f}"
-        )
-        rec["score"] = float(boosted_score)
-
-    # Re-sort by new scores
-    recommendations.sort(key=lambda x: x["score"], reverse=True)
-
-    return recommendations
+        return niche_boost_factor
+    # Exponential scaling for values above 0.5
+    # k=3 gives good exponential growth: f(0.5)=0.5, f(1.0)≈1.32
+    k = 4.62
+    excess = niche_boost_factor - 0.5
+    return float(0.5 + excess * np.exp(k * excess))
 
 
 def compute_profile_holdout_analysis(
@@ -422,7 +2059,7 @@ def compute_profile_holdout_analysis(
     logit_weight: float | None,
     baseline_top50_indices: np.ndarray,
     baseline_top50_scores: np.ndarray,
-) -> dict:
+) -> ProfileHoldout:
     """Compute holdout analysis for items in the user's profile."""
     metrics = compute_holdout_metrics(
         model.params,
@@ -432,132 +2069,210 @@ def compute_profile_holdout_analysis(
         logit_weight=logit_weight,
         baseline_top50_indices=baseline_top50_indices,
         baseline_top50_scores=baseline_top50_scores,
+        holdout_outputs=get_profile_holdout_outputs(
+            model, corpus_indices, normalized_ratings
+        ),
     )
 
     rating_errors = metrics["rating_errors"]
-    pred_ratings = metrics["pred_ratings"]
     presence_probs = metrics["presence_probs"]
-    held_out_indices_np = metrics["held_out_indices"]
-    held_out_ratings_np = metrics["held_out_ratings"]
-    recommendation_scores = metrics["recommendation_scores"]
-    impact_scores = metrics.get("impact_scores", np.zeros(len(rating_errors)))
-    actual_size = len(held_out_indices_np)
-
-    items = []
-    for i in range(actual_size):
-        corpus_idx = int(held_out_indices_np[i])
-        items.append(
-            {
-                "anime_id": model.corpus_ids[corpus_idx],
-                "corpus_idx": corpus_idx,
-                "true_rating": float(original_ratings[i]),
-                "true_normalized_rating": float(held_out_ratings_np[i]),
-                "predicted_rating": float(pred_ratings[i]),
-                "rating_error": float(rating_errors[i]),
-                "presence_probability": float(presence_probs[i]),
-                "recommendation_score": float(recommendation_scores[i]),
-                "impact_score": float(impact_scores[i]),
-            }
-        )
-
-    return {
-        "items": items,
-        "mean_rating_error": float(np.mean(rating_errors)),
-        "std_rating_error": float(np.std(rating_errors)),
-        "mean_presence_prob": float(np.mean(presence_probs)),
-        "std_presence_prob": float(np.std(presence_probs)),
-    }
+    held_out_indices = metrics["held_out_indices"]
+    actual_size = len(held_out_indices)
+
+    return ProfileHoldout(
+        corpus_indices=held_out_indices,
+        anime_ids=model.corpus_ids_array[held_out_indices],
+        true_ratings=original_ratings[:actual_size],
+        true_normalized_ratings=metrics["held_out_ratings"],
+        predicted_ratings=metrics["pred_ratings"],
+        rating_errors=rating_errors,
+        presence_probabilities=presence_probs,
+        recommendation_scores=metrics["recommendation_scores"],
+        impact_scores=metrics.get("impact_scores", np.zeros(actual_size)),
+        mean_rating_error=float(np.mean(rating_errors)),
+        std_rating_error=float(np.std(rating_errors)),
+        mean_presence_prob=float(np.mean(presence_probs)),
+        std_presence_prob=float(np.std(presence_probs)),
+    )
 
 
 def compute_recommendation_contributions(
     model: RecommenderModel,
     corpus_indices: np.ndarray,
     normalized_ratings: np.ndarray,
-    recommendations: list[dict],
+    recommendations: Recommendations,
     top_n_contributors: int,
     logit_weight: float | None,
     use_alt_ranking: bool = False,
-) -> list[dict]:
+) -> Recommendations:
     """
     For each recommendation, compute which profile items contribute most to its score.
 
     This works by holding out each profile item one at a time and measuring how much
     the recommendation's score drops.
     """
-    rec_corpus_indices = [r["corpus_idx"] for r in recommendations]
     n_profile_items = len(corpus_indices)
     n_recs = len(recommendations)
 
     if n_profile_items == 0 or n_recs == 0:
         return recommendations
 
-    # Get baseline scores for all recommendations
-    input_vector = make_dense_profile(corpus_indices, normalized_ratings)
-    item_logits, rating_pred = infer_outputs(model.params, input_vector)
-    ranking_fn = (
-        compute_recommendation_ranking_score_alt
-        if use_alt_ranking
-        else compute_recommendation_ranking_score
-    )
-    baseline_scores, _ = ranking_fn(item_logits[0], rating_pred[0], logit_weight)
-    baseline_scores_for_recs = np.array(
-        [float(baseline_scores[idx]) for idx in rec_corpus_indices]
+    if logit_weight is None:
+        logit_weight = CONF["rec_logit_weight"]
+
+    rec_corpus_indices = recommendations.corpus_indices.astype(np.int32)
+
+    # Full-profile outputs for baseline scores
+    outputs = get_profile_outputs(model, corpus_indices, normalized_ratings)
+
+    # Batched inference for all holdouts, padded to the holdout batch size
+    # ho_logits: (batch_size, corpus_size)
+    # ho_ratings: (batch_size, corpus_size)
+    ho_logits, ho_ratings = get_profile_holdout_outputs(
+        model, corpus_indices, normalized_ratings
     )
 
-    # Batched inference for all holdouts
-    # ho_logits: (n_profile_items, corpus_size)
-    # ho_ratings: (n_profile_items, corpus_size)
-    ho_logits, ho_ratings = batch_holdout_predict(
-        model.params, corpus_indices, normalized_ratings, model.corpus_size
+    # Score drops for every (recommendation, profile item) pair are computed on device;
+    # only the top N contributors per recommendation are transferred back
+    top_drops, top_positions = recommendation_contributions_kernel(
+        outputs.item_logits,
+        outputs.rating_pred,
+        ho_logits,
+        ho_ratings,
+        jnp.asarray(rec_corpus_indices),
+        logit_weight,
+        n_profile_items,
+        # Padding rows are never selected with a positive score drop, so this only
+        # depends on the padded batch size
+        top_n=min(top_n_contributors, ho_logits.shape[0]),
+        use_alt_ranking=use_alt_ranking,
+    )
+    top_drops = np.array(top_drops)
+    top_positions = np.array(top_positions)
+
+    # Only include contributors with a positive contribution.  Masking keeps each
+    # recommendation's contributors in order and contiguous.
+    positive = top_drops > 0
+    contributor_offsets = np.zeros(n_recs + 1, dtype=np.int64)
+    np.cumsum(positive.sum(axis=1), out=contributor_offsets[1:])
+    contributor_corpus_indices = corpus_indices[top_positions[positive]]
+    return replace(
+        recommendations,
+        contributor_offsets=contributor_offsets,
+        contributor_corpus_indices=contributor_corpus_indices,
+        contributor_anime_ids=model.corpus_ids_array[contributor_corpus_indices],
+        contributor_scores=top_drops[positive],
     )
 
-    # Convert to numpy for processing (or use JAX for vectorized score computation)
-    ho_logits_np = np.array(ho_logits)
-    ho_ratings_np = np.array(ho_ratings)
 
-    # For each profile item, compute scores with that item held out
-    score_drops = np.zeros((n_profile_items, n_recs), dtype=np.float32)
+def _warmup_profile_lengths(max_profile_length: int, num_devices: int) -> list[int]:
+    """
+    Return one profile length for every distinct set of compiled shapes that profiles of
+    up to `max_profile_length` items map to when run across `num_devices` devices.
+    """
+    lengths_by_shape = {}
+    for n_items in range(1, max_profile_length + 1):
+        shape_key = (
+            sparse_profile_pad_length(n_items),
+            tuple(get_holdout_bucket_sizes(n_items, num_devices)),
+        )
+        lengths_by_shape.setdefault(shape_key, n_items)
+    return sorted(lengths_by_shape.values())
+
 
-    for i in range(n_profile_items):
-        # Compute scores for all recommendations using this holdout's predictions
-        # Use JAX for the score computation part to keep it relatively fast
-        holdout_scores, _ = ranking_fn(
-            jnp.array(ho_logits_np[i]),
-            jnp.array(ho_ratings_np[i]),
-            logit_weight,
+def warmup_model(
+    model: RecommenderModel,
+    max_profile_length: int,
+    top_ks: list[int],
+    max_batch_size: int,
+) -> None:
+    """
+    Run every served code path once for each input shape it can be called with so that
+    JIT compilation happens before live traffic arrives (called in executor).
+    """
+    start_time = time.perf_counter()
+    max_profile_length = min(max_profile_length, model.corpus_size)
+    profile_lengths = _warmup_profile_lengths(max_profile_length, model.num_devices)
+    logit_weight = CONF["rec_logit_weight"]
+
+    # Lanes warm up concurrently and share the output cache, so each lane seeds with
+    # its devices to keep it from hitting another lane's dummy profiles
+    rng = np.random.default_rng(
+        0 if model.mesh is None else [device.id for device in model.mesh.devices.flat]
+    )
+
+    def dummy_profile(n_items: int) -> tuple[np.ndarray, np.ndarray]:
+        # Random ratings, so that every call misses the output cache and runs the model
+        return (
+            np.arange(n_items, dtype=np.int32),
+            rng.standard_normal(n_items).astype(np.float32),
         )
 
-        for j, rec_idx in enumerate(rec_corpus_indices):
-            score_drops[i, j] = baseline_scores_for_recs[j] - float(
-                holdout_scores[rec_idx]
-            )
-
-    # For each recommendation, find the top N contributors
-    enriched_recs = []
-    for j, rec in enumerate(recommendations):
-        drops_for_rec = score_drops[:, j]
-        # Sort by score drop (descending) - items that cause biggest drop are top contributors
-        top_contributor_indices = np.argsort(drops_for_rec)[::-1][:top_n_contributors]
-
-        contributors = []
-        for idx in top_contributor_indices:
-            corpus_idx = int(corpus_indices[idx])
-            drop = float(drops_for_rec[idx])
-            # Only include if there's a positive contribution
-            if drop > 0:
-                contributors.append(
-                    {
-                        "anime_id": model.corpus_ids[corpus_idx],
-                        "corpus_idx": corpus_idx,
-                        "score_contribution": drop,
-                    }
+    # Simple path, both unbatched and for every batch size the batcher pads to
+    batch_sizes = [1]
+    while batch_sizes[-1] < max_batch_size:
+        batch_sizes.append(batch_sizes[-1] * 2)
+    for pad_length in sorted({sparse_profile_pad_length(n) for n in profile_lengths}):
+        idxs, vals = dummy_profile(pad_length)
+        for top_k in top_ks:
+            for use_alt_ranking in (False, True):
+                get_recommendations_simple(
+                    model, idxs, vals, top_k, logit_weight, use_alt_ranking
                 )
+                if max_batch_size <= 1:
+                    continue
+                for batch_size in batch_sizes:
+                    batch_idxs, batch_vals = dummy_profile(pad_length)
+                    _run_batched_recommendations(
+                        model,
+                        [
+                            _BatchedRecommendJob(
+                                corpus_indices=batch_idxs,
+                                normalized_ratings=batch_vals,
+                                top_k=top_k,
+                                logit_weight=logit_weight,
+                                use_alt_ranking=use_alt_ranking,
+                                niche_boost_factor=0.0,
+                                excluded_mask=None,
+                                collapse_franchises=False,
+                                future=None,
+                            )
+                        ]
+                        * batch_size,
+                    )
+    logger.info(f"Warmed up simple path in {time.perf_counter() - start_time:.1f}s")
+
+    # Holdout and contribution analysis for every holdout bucket
+    for n_items in profile_lengths:
+        idxs, vals = dummy_profile(n_items)
+        item_start_time = time.perf_counter()
+        for top_k in top_ks:
+            for use_alt_ranking in (False, True):
+                recommendations = get_recommendations_simple(
+                    model, idxs, vals, top_k, logit_weight, use_alt_ranking
+                )
+                compute_recommendation_contributions(
+                    model,
+                    idxs,
+                    vals,
+                    recommendations,
+                    3,
+                    logit_weight,
+                    use_alt_ranking,
+                )
+            _run_holdout_analysis(
+                model, idxs, vals, vals, logit_weight, recommendations
+            )
+        logger.info(
+            f"Warmed up holdout analysis for {n_items}-item profiles in "
+            f"{time.perf_counter() - item_start_time:.1f}s"
+        )
 
-        enriched_rec = rec.copy()
-        enriched_rec["top_contributors"] = contributors
-        enriched_recs.append(enriched_rec)
-
-    return enriched_recs
+    logger.info(f"Warmup finished in {time.perf_counter() - start_time:.1f}s")
+    cache_stats = get_compilation_cache_stats()
+    logger.info(
+        f"Compilation cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses"
+    )
 
 
 # Pydantic models for request/response validation
@@ -567,8 +2282,7 @@ class ProfileEntry(BaseModel):
     watch_status: str = ""
 
 
-class RecommendRequest(BaseModel):
-    profile: list[ProfileEntry]
+class RecommendOptions(BaseModel):
     top_k: int = 50
     logit_weight: float | None = None
     include_profile_holdout: bool = False
@@ -576,6 +2290,84 @@ class RecommendRequest(BaseModel):
     top_contributors: int = 3
     use_alt_ranking: bool = False
     niche_boost_factor: float = 0.0
+    # Items to leave out of the recommendations, on top of those in the profile
+    excluded_anime_ids: list[int] = []
+    excluded_genre_ids: list[int] = []
+    excluded_media_types: list[str] = []
+    # If non-empty, leave out every media type not listed
+    included_media_types: list[str] = []
+    # Recommend only the best-scoring anime of each franchise, and none from franchises
+    # already in the profile (see `build_franchise_ids`)
+    collapse_franchises: bool = False
+    # Anime whose franchises `collapse_franchises` also leaves out, e.g. watched anime
+    # that were left out of the profile
+    franchise_seed_anime_ids: list[int] = []
+
+    @field_validator(
+        "excluded_anime_ids",
+        "excluded_genre_ids",
+        "excluded_media_types",
+        "included_media_types",
+        "franchise_seed_anime_ids",
+    )
+    @classmethod
+    def normalize_exclusions(cls, value: list) -> list:
+        # Sorted and deduplicated so the cache key doesn't depend on their order
+        return sorted(set(value))
+
+
+class RecommendRequest(RecommendOptions):
+    """
+    Options plus a profile, either as a list of entries or as parallel columns.
+
+    The columnar form (`anime_ids`, with optional `ratings` and `watch_statuses` of the
+    same length) is much cheaper to parse for long profiles.
+    """
+
+    profile: list[ProfileEntry] | None = None
+    anime_ids: list[int] | None = None
+    ratings: list[float] | None = None
+    watch_statuses: list[str] | None = None
+
+    @model_validator(mode="after")
+    def check_profile(self) -> "RecommendRequest":
+        if (self.profile is None) == (self.anime_ids is None):
+            raise ValueError("exactly one of profile and anime_ids must be given")
+        for name in ("ratings", "watch_statuses"):
+            column = getattr(self, name)
+            if column is not None and len(column) != len(self.anime_ids or []):
+                raise ValueError(f"{name} must have the same length as anime_ids")
+        return self
+
+    def profile_columns(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Return the profile as (anime_ids, ratings, watch_status_codes) arrays."""
+        if self.profile is not None:
+            anime_ids = [entry.anime_id for entry in self.profile]
+            ratings = [entry.rating for entry in self.profile]
+            watch_statuses = [entry.watch_status for entry in self.profile]
+        else:
+            anime_ids = self.anime_ids
+            ratings = self.ratings
+            watch_statuses = self.watch_statuses
+
+        n = len(anime_ids)
+        return (
+            np.array(anime_ids, dtype=np.int64),
+            (
+                np.zeros(n, dtype=np.float32)
+                if ratings is None
+                else np.array(ratings, dtype=np.float32)
+            ),
+            (
+                np.zeros(n, dtype=np.uint8)
+                if watch_statuses is None
+                else encode_watch_statuses(watch_statuses)
+            ),
+        )
+
+
+class RecommendBatchRequest(RecommendOptions):
+    profiles: list[list[ProfileEntry]]
 
 
 # FastAPI app
@@ -586,19 +2378,108 @@ app = FastAPI(title="Anime Recommendation Model Server")
 async def startup_event():
     """Load the model at startup."""
     logger.info("Loading model at startup...")
-    get_model()
+    model = get_model()
     logger.info("Model loaded successfully")
+    _lanes.configure(model)
+    if _batcher.max_batch_size > 1:
+        _batcher.start()
+
+    global _weights_checksum, _snapshot_task, _snapshot_writes
+    if _RESPONSE_CACHE_SNAPSHOT_PATH:
+        _weights_checksum = await asyncio.to_thread(compute_response_checksum, model)
+        entries = await asyncio.to_thread(
+            read_cache_snapshot, _RESPONSE_CACHE_SNAPSHOT_PATH, _weights_checksum
+        )
+        restored = _cache.restore(entries)
+        _snapshot_writes = _cache.writes
+        logger.info(
+            f"Restored {restored} cached responses from {_RESPONSE_CACHE_SNAPSHOT_PATH}"
+        )
+        if _RESPONSE_CACHE_SNAPSHOT_INTERVAL_S > 0:
+            _snapshot_task = asyncio.get_running_loop().create_task(
+                _snapshot_cache_periodically(_RESPONSE_CACHE_SNAPSHOT_INTERVAL_S)
+            )
 
+    global _warmup_complete, _warmup_task
+    if not _WARMUP_ENABLED:
+        _warmup_complete = True
+        return
 
-@app.get("/health")
-async def health():
-    """Health check endpoint."""
-    return {"status": "ok"}
+    async def run_warmup() -> None:
+        global _warmup_complete
+        try:
+            # Compiled programs are specific to the devices they run on, so every lane
+            # needs its own warmup
+            await _lanes.run_on_each_lane(
+                warmup_model,
+                _WARMUP_MAX_PROFILE_LENGTH,
+                _WARMUP_TOP_K,
+                max(_batcher.max_batch_size, _RECOMMEND_BATCH_CHUNK_SIZE),
+            )
+        except Exception:
+            logger.exception("Warmup failed")
+        # Drop the dummy profiles' outputs, once every lane is done with them
+        _output_cache.clear()
+        # Even if warmup failed, the server can still handle requests
+        _warmup_complete = True
+
+    logger.info("Starting warmup...")
+    _warmup_task = asyncio.get_running_loop().create_task(run_warmup())
+
+
+async def save_cache_snapshot() -> None:
+    """Write the response cache to the snapshot file if it changed since the last save."""
+    global _snapshot_writes
+    if _cache.writes == _snapshot_writes:
+        return
+    # Entries are immutable, so the list can be written out off the event loop while
+    # the cache keeps changing
+    writes = _cache.writes
+    entries = _cache.entries()
+    await asyncio.to_thread(
+        write_cache_snapshot,
+        _RESPONSE_CACHE_SNAPSHOT_PATH,
+        _weights_checksum,
+        entries,
+    )
+    _snapshot_writes = writes
+    logger.info(
+        f"Saved {len(entries)} cached responses to {_RESPONSE_CACHE_SNAPSHOT_PATH}"
+    )
 
 
-def _run_inference(
-    model: RecommenderModel,
-    corpus_indices: np.ndarray,
+async def _snapshot_cache_periodically(interval_seconds: float) -> None:
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            await save_cache_snapshot()
+        except Exception:
+            logger.exception("Failed to save response cache snapshot")
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await _batcher.stop()
+    if _snapshot_task is not None:
+        _snapshot_task.cancel()
+    if _weights_checksum is not None:
+        try:
+            await save_cache_snapshot()
+        except Exception:
+            logger.exception("Failed to save response cache snapshot")
+
+
+@app.get("/health")
+async def health():
+    """Health check endpoint.  Reports not-ready until startup warmup has finished."""
+    if not _warmup_complete:
+        return JSONResponse(status_code=503, content={"status": "warming_up"})
+    return {"status": "ok"}
+
+
+def _run_inference(
+    model: RecommenderModel,
+    corpus_indices: np.ndarray,
     normalized_ratings: np.ndarray,
     original_ratings: np.ndarray,
     top_k: int,
@@ -608,32 +2489,22 @@ def _run_inference(
     top_contributors: int,
     use_alt_ranking: bool = False,
     niche_boost_factor: float = 0.0,
-) -> tuple[list[dict], dict | None]:
+    excluded_mask: np.ndarray | None = None,
+    collapse_franchises: bool = False,
+) -> tuple[Recommendations, ProfileHoldout | None]:
     """Run model inference (called in executor to serialize access)."""
-    # If niche boost is enabled, fetch more recommendations to allow composition changes
-    # This ensures the boost can promote items that wouldn't have made the initial top_k
-    if niche_boost_factor > 0 and model.popularity_distribution is not None:
-        # Fetch top_k * 3 recommendations (capped at 500) for niche boosting
-        expanded_k = min(top_k * 3, 500)
-    else:
-        expanded_k = top_k
-
     recommendations = get_recommendations_simple(
         model,
         corpus_indices,
         normalized_ratings,
-        expanded_k,
+        top_k,
         logit_weight,
         use_alt_ranking,
+        niche_boost_factor,
+        excluded_mask,
+        collapse_franchises,
     )
 
-    # Apply niche boost as final step (after all other scoring is done)
-    # This will re-sort and potentially change the composition of top recommendations
-    recommendations = apply_niche_boost(recommendations, model, niche_boost_factor)
-
-    # Truncate to requested top_k after boost is applied
-    recommendations = recommendations[:top_k]
-
     if include_contribution_analysis:
         recommendations = compute_recommendation_contributions(
             model,
@@ -647,68 +2518,118 @@ def _run_inference(
 
     profile_holdout = None
     if include_profile_holdout:
-        # Extract top-50 (or top_k) indices and scores for impact calculation
-        # Use up to 50 recommendations for impact scoring
-        num_for_impact = min(50, len(recommendations))
-        baseline_top50_indices = np.array(
-            [r["corpus_idx"] for r in recommendations[:num_for_impact]], dtype=np.int32
-        )
-        baseline_top50_scores = np.array(
-            [r["score"] for r in recommendations[:num_for_impact]], dtype=np.float32
-        )
-
-        profile_holdout = compute_profile_holdout_analysis(
+        profile_holdout = _run_holdout_analysis(
             model,
             corpus_indices,
             normalized_ratings,
             original_ratings,
             logit_weight,
-            baseline_top50_indices,
-            baseline_top50_scores,
+            recommendations,
         )
 
     return recommendations, profile_holdout
 
 
-@app.post("/recommend")
-async def recommend(req: RecommendRequest):
-    """Get recommendations for a user profile."""
-    try:
-        # Check cache first
-        cached_response = _cache.get(req)
-        if cached_response is not None:
-            logger.debug("Cache hit for request")
-            return cached_response
+def _run_holdout_analysis(
+    model: RecommenderModel,
+    corpus_indices: np.ndarray,
+    normalized_ratings: np.ndarray,
+    original_ratings: np.ndarray,
+    logit_weight: float | None,
+    recommendations: Recommendations,
+) -> ProfileHoldout:
+    """Run `compute_profile_holdout_analysis`, scoring impact on `recommendations`."""
+    # Extract top-50 (or top_k) indices and scores for impact calculation
+    # Use up to 50 recommendations for impact scoring
+    num_for_impact = min(50, len(recommendations))
+    baseline_top50_indices = recommendations.corpus_indices[:num_for_impact].astype(
+        np.int32
+    )
+    baseline_top50_scores = recommendations.scores[:num_for_impact].astype(np.float32)
 
-        if not req.profile:
-            raise HTTPException(
-                status_code=400, detail="profile must be a non-empty list"
-            )
+    return compute_profile_holdout_analysis(
+        model,
+        corpus_indices,
+        normalized_ratings,
+        original_ratings,
+        logit_weight,
+        baseline_top50_indices,
+        baseline_top50_scores,
+    )
 
-        # Convert pydantic models to dicts for existing code
-        profile = [entry.model_dump() for entry in req.profile]
 
-        model = get_model()
+def _request_exclusion_mask(
+    model: RecommenderModel, req: "RecommendOptions", corpus_indices: np.ndarray
+) -> np.ndarray | None:
+    """Resolve a request's exclusion and franchise options for one profile."""
+    excluded_mask = build_exclusion_mask(
+        model,
+        req.excluded_anime_ids,
+        req.excluded_genre_ids,
+        req.excluded_media_types,
+        req.included_media_types,
+    )
+    if req.collapse_franchises:
+        excluded_mask = exclude_profile_franchises(
+            model, excluded_mask, corpus_indices, req.franchise_seed_anime_ids
+        )
+    return excluded_mask
 
-        try:
-            (
-                corpus_indices,
-                normalized_ratings,
-                original_ratings,
-                valid_entries,
-                norm_stats,
-            ) = preprocess_profile(model, profile)
-        except ValueError as e:
-            raise HTTPException(status_code=400, detail=str(e))
-
-        # Run inference in executor to serialize model access
-        loop = asyncio.get_event_loop()
-        recommendations, profile_holdout = await loop.run_in_executor(
-            _inference_executor,
-            _run_inference,
+
+async def _compute_recommendations(
+    model: RecommenderModel,
+    req: "RecommendOptions",
+    corpus_indices: np.ndarray,
+    normalized_ratings: np.ndarray,
+    excluded_mask: np.ndarray | None,
+) -> Recommendations:
+    """Get the recommendations for a preprocessed profile, without any analysis."""
+    if _batcher.max_batch_size > 1:
+        # Batched with other concurrent requests
+        return await _batcher.submit(
             model,
             corpus_indices,
             normalized_ratings,
+            req.top_k,
+            req.logit_weight,
+            req.use_alt_ranking,
+            req.niche_boost_factor,
+            excluded_mask,
+            req.collapse_franchises,
+        )
+    return await _lanes.run(
+        get_recommendations_simple,
+        corpus_indices,
+        normalized_ratings,
+        req.top_k,
+        req.logit_weight,
+        req.use_alt_ranking,
+        req.niche_boost_factor,
+        excluded_mask,
+        req.collapse_franchises,
+    )
+
+
+async def _compute_response(
+    model: RecommenderModel,
+    req: "RecommendOptions",
+    corpus_indices: np.ndarray,
+    normalized_ratings: np.ndarray,
+    original_ratings: np.ndarray,
+) -> tuple[Recommendations, ProfileHoldout | None]:
+    """Run inference and the requested analysis for a preprocessed `/recommend` request."""
+    excluded_mask = _request_exclusion_mask(model, req, corpus_indices)
+    if not req.include_contribution_analysis and not req.include_profile_holdout:
+        recommendations = await _compute_recommendations(
+            model, req, corpus_indices, normalized_ratings, excluded_mask
+        )
+        profile_holdout = None
+    else:
+        # Run inference on an inference lane's executor to serialize model access
+        recommendations, profile_holdout = await _lanes.run(
+            _run_inference,
+            corpus_indices,
+            normalized_ratings,
             original_ratings,
             req.top_k,
             req.logit_weight,
@@ -717,30 +2638,592 @@ async def recommend(req: RecommendRequest):
             req.top_contributors,
             req.use_alt_ranking,
             req.niche_boost_factor,
+            excluded_mask,
+            req.collapse_franchises,
+            cost=estimate_inference_cost(
+                len(corpus_indices),
+                req.include_contribution_analysis,
+                req.include_profile_holdout,
+            ),
         )
 
-        # Clean up normalization stats for JSON serialization
-        clean_norm_stats = {
-            k: (v.tolist() if isinstance(v, np.ndarray) else v)
-            for k, v in norm_stats.items()
+    return recommendations, profile_holdout
+
+
+def _build_response(
+    recommendations: Recommendations,
+    profile_holdout: ProfileHoldout | None,
+    norm_stats: dict,
+) -> dict:
+    # Clean up normalization stats for JSON serialization
+    clean_norm_stats = {
+        k: (v.tolist() if isinstance(v, np.ndarray) else v)
+        for k, v in norm_stats.items()
+    }
+
+    return {
+        "recommendations": recommendations.to_dicts(),
+        "profile_holdout": (
+            None if profile_holdout is None else profile_holdout.to_dict()
+        ),
+        "normalization_stats": clean_norm_stats,
+    }
+
+
+def encode_response(
+    recommendations: Recommendations,
+    profile_holdout: ProfileHoldout | None,
+    norm_stats: dict,
+    content_type: str = "application/json",
+) -> bytes:
+    """Encode a `/recommend` response body as `content_type`."""
+    if content_type == RECOMMENDATION_COLUMNS_CONTENT_TYPE:
+        return encode_columns_response(recommendations, profile_holdout, norm_stats)
+    return encode_json_response(
+        _build_response(recommendations, profile_holdout, norm_stats)
+    )
+
+
+async def _read_recommend_request(
+    request: Request,
+) -> tuple[RecommendOptions, tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """
+    Parse a `/recommend` body into its options and profile columns.
+
+    Accepts a JSON `RecommendRequest`, or a PROFILE_COLUMNS_CONTENT_TYPE body with the
+    options in the query string.
+    """
+    body = await request.body()
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    try:
+        if content_type == PROFILE_COLUMNS_CONTENT_TYPE:
+            # List options are given by repeating the parameter
+            options = RecommendOptions.model_validate(
+                {
+                    name: (
+                        request.query_params.getlist(name)
+                        if get_origin(RecommendOptions.model_fields[name].annotation)
+                        is list
+                        else value
+                    )
+                    for name, value in request.query_params.items()
+                    if name in RecommendOptions.model_fields
+                }
+            )
+            try:
+                columns = decode_profile_columns(body)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            return options, columns
+
+        req = RecommendRequest.model_validate_json(body)
+        return req, req.profile_columns()
+    except ValidationError as e:
+        raise RequestValidationError(e.errors())
+
+
+async def _preprocess_recommend_request(
+    request: Request,
+) -> tuple[RecommendOptions, RecommenderModel, tuple]:
+    """
+    Parse and preprocess a `/recommend` body.
+
+    Returns:
+        (options, model, preprocessed profile), the profile being the tuple returned by
+        `preprocess_profile_columns`
+    """
+    req, (anime_ids, ratings, watch_status_codes) = await _read_recommend_request(
+        request
+    )
+    if len(anime_ids) == 0:
+        raise HTTPException(status_code=400, detail="profile must be a non-empty list")
+
+    model = get_model()
+
+    try:
+        profile = preprocess_profile_columns(
+            model, anime_ids, ratings, watch_status_codes
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return req, model, profile
+
+
+# Request body of `/recommend` and `/recommend/stream` for the OpenAPI schema, since
+# they read it themselves to accept more than JSON
+_RECOMMEND_OPENAPI_EXTRA = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "application/json": {"schema": RecommendRequest.model_json_schema()},
+            PROFILE_COLUMNS_CONTENT_TYPE: {
+                "schema": {"type": "string", "format": "binary"}
+            },
+        },
+    }
+}
+
+
+@app.post("/recommend", openapi_extra=_RECOMMEND_OPENAPI_EXTRA)
+async def recommend(request: Request):
+    """
+    Get recommendations for a user profile.
+
+    Responds with JSON, or with RECOMMENDATION_COLUMNS_CONTENT_TYPE if the Accept
+    header asks for it.
+    """
+    try:
+        content_type = negotiate_response_content_type(request.headers.get("accept"))
+        # The response depends on the Accept header, so shared caches must key on it
+        headers = {"Vary": "Accept"}
+        req, model, profile = await _preprocess_recommend_request(request)
+        corpus_indices, normalized_ratings, original_ratings, norm_stats = profile
+
+        # Check cache first
+        cache_key = _cache.make_key(req, corpus_indices, original_ratings, content_type)
+        cached_body = _cache.get(cache_key)
+        if cached_body is not None:
+            logger.debug("Cache hit for request")
+            return Response(
+                content=cached_body, media_type=content_type, headers=headers
+            )
+
+        async def compute_body() -> bytes:
+            start_time = time.perf_counter()
+            recommendations, profile_holdout = await _compute_response(
+                model, req, corpus_indices, normalized_ratings, original_ratings
+            )
+
+            # Store in cache.  The encoded body is cached so hits skip serialization.
+            body = encode_response(
+                recommendations, profile_holdout, norm_stats, content_type
+            )
+            _cache.put(cache_key, body, time.perf_counter() - start_time)
+            logger.debug(f"Cached response (cache size: {len(_cache)})")
+            return body
+
+        # Identical requests that arrive while this one is computing share its result
+        body = await _in_flight.run(cache_key, compute_body)
+        return Response(content=body, media_type=content_type, headers=headers)
+
+    except (HTTPException, RequestValidationError):
+        raise
+    except Exception as e:
+        logger.exception("Error processing recommendation request")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+NDJSON_CONTENT_TYPE = "application/x-ndjson"
+
+
+def _encode_stream_message(message: dict) -> bytes:
+    return encode_json_response(message) + b"\n"
+
+
+def _stream_recommendations_message(
+    recommendations: list[dict], normalization_stats: dict
+) -> bytes:
+    return _encode_stream_message(
+        {
+            "type": "recommendations",
+            "recommendations": [
+                {k: v for k, v in rec.items() if k != "top_contributors"}
+                for rec in recommendations
+            ],
+            "normalization_stats": normalization_stats,
         }
+    )
 
-        response = {
-            "recommendations": recommendations,
-            "profile_holdout": profile_holdout,
-            "normalization_stats": clean_norm_stats,
+
+def _stream_contributions_message(index: int, recommendation: dict) -> bytes:
+    return _encode_stream_message(
+        {
+            "type": "contributions",
+            "index": index,
+            "anime_id": recommendation["anime_id"],
+            "top_contributors": recommendation["top_contributors"],
         }
+    )
+
+
+def _stream_holdout_message(profile_holdout: dict) -> bytes:
+    return _encode_stream_message(
+        {"type": "profile_holdout", "profile_holdout": profile_holdout}
+    )
+
 
-        # Store in cache
-        _cache.put(req, response)
-        logger.debug(f"Cached response (cache size: {len(_cache)})")
+def _stream_cached_response(body: bytes) -> list[bytes]:
+    """Split a cached `/recommend` response body into `/recommend/stream` messages."""
+    response = json.loads(body)
+    recommendations = response["recommendations"]
+    messages = [
+        _stream_recommendations_message(
+            recommendations, response["normalization_stats"]
+        )
+    ]
+    messages.extend(
+        _stream_contributions_message(index, rec)
+        for index, rec in enumerate(recommendations)
+        if "top_contributors" in rec
+    )
+    if response["profile_holdout"] is not None:
+        messages.append(_stream_holdout_message(response["profile_holdout"]))
+    return messages
+
+
+async def _compute_streamed_response(
+    model: RecommenderModel,
+    req: RecommendOptions,
+    cache_key: bytes,
+    corpus_indices: np.ndarray,
+    normalized_ratings: np.ndarray,
+    original_ratings: np.ndarray,
+    norm_stats: dict,
+    messages: asyncio.Queue,
+) -> bytes:
+    """
+    Compute a `/recommend` response in stages, putting each stage's messages on
+    `messages` as soon as it is done, then None.  The assembled response is cached and
+    returned as for `/recommend`.
+
+    The contributions of every recommendation are computed by one inference lane job,
+    so they are all put on `messages` together.
+    """
+    start_time = time.perf_counter()
+    try:
+        recommendations = await _compute_recommendations(
+            model,
+            req,
+            corpus_indices,
+            normalized_ratings,
+            _request_exclusion_mask(model, req, corpus_indices),
+        )
+        response = _build_response(recommendations, None, norm_stats)
+        messages.put_nowait(
+            _stream_recommendations_message(
+                response["recommendations"], response["normalization_stats"]
+            )
+        )
+
+        # Each analysis is its own inference lane job, so other requests can run
+        # between the stages.  Both reuse the profile's cached holdout outputs.
+        if req.include_contribution_analysis:
+            recommendations = await _lanes.run(
+                compute_recommendation_contributions,
+                corpus_indices,
+                normalized_ratings,
+                recommendations,
+                req.top_contributors,
+                req.logit_weight,
+                req.use_alt_ranking,
+                cost=estimate_inference_cost(len(corpus_indices), True, False),
+            )
+            response["recommendations"] = recommendations.to_dicts()
+            for index, rec in enumerate(response["recommendations"]):
+                messages.put_nowait(_stream_contributions_message(index, rec))
+
+        if req.include_profile_holdout:
+            profile_holdout = await _lanes.run(
+                _run_holdout_analysis,
+                corpus_indices,
+                normalized_ratings,
+                original_ratings,
+                req.logit_weight,
+                recommendations,
+                cost=estimate_inference_cost(len(corpus_indices), False, True),
+            )
+            response["profile_holdout"] = profile_holdout.to_dict()
+            messages.put_nowait(_stream_holdout_message(response["profile_holdout"]))
+    finally:
+        messages.put_nowait(None)
+
+    body = encode_json_response(response)
+    _cache.put(cache_key, body, time.perf_counter() - start_time)
+    return body
+
+
+async def _stream_response(
+    model: RecommenderModel,
+    req: RecommendOptions,
+    cache_key: bytes,
+    corpus_indices: np.ndarray,
+    normalized_ratings: np.ndarray,
+    original_ratings: np.ndarray,
+    norm_stats: dict,
+):
+    """
+    Yield a `/recommend/stream` response's messages as they are computed (see
+    `_compute_streamed_response`).
 
-        return response
+    Shares `_in_flight` with `/recommend`, which uses the same cache key for JSON
+    responses.  If an identical request is already computing, its messages are sent
+    all at once when it is done.
+    """
+    messages = asyncio.Queue()
+
+    def compute_body():
+        return _compute_streamed_response(
+            model,
+            req,
+            cache_key,
+            corpus_indices,
+            normalized_ratings,
+            original_ratings,
+            norm_stats,
+            messages,
+        )
+
+    body_task = asyncio.ensure_future(_in_flight.run(cache_key, compute_body))
+    next_message = None
+    try:
+        # Messages are only put on the queue if this request is the one computing, in
+        # which case the last one is None
+        streamed = False
+        while True:
+            next_message = asyncio.ensure_future(messages.get())
+            await asyncio.wait(
+                (next_message, body_task), return_when=asyncio.FIRST_COMPLETED
+            )
+            if next_message.done():
+                message = next_message.result()
+            else:
+                next_message.cancel()
+                message = None if messages.empty() else messages.get_nowait()
+            if message is None:
+                break
+            streamed = True
+            yield message
+
+        body = await body_task
+        if not streamed:
+            for message in _stream_cached_response(body):
+                yield message
+    except Exception as e:
+        # The status line has already been sent, so errors are reported in the stream
+        logger.exception("Error streaming recommendation response")
+        yield _encode_stream_message({"type": "error", "detail": str(e)})
+    finally:
+        # The shared computation carries on without this request
+        body_task.cancel()
+        if next_message is not None:
+            next_message.cancel()
+
+
+@app.post("/recommend/stream", openapi_extra=_RECOMMEND_OPENAPI_EXTRA)
+async def recommend_stream(request: Request):
+    """
+    Get recommendations for a user profile as a stream of newline-delimited JSON
+    messages, so they can be shown before the requested analysis is done.
+
+    Takes the same request as `/recommend`.  Messages are sent in this order:
+        {"type": "recommendations", "recommendations": [...],
+         "normalization_stats": {...}}
+        {"type": "contributions", "index": i, "anime_id": ...,
+         "top_contributors": [...]} for each recommendation, if
+         include_contribution_analysis
+        {"type": "profile_holdout", "profile_holdout": {...}}, if
+         include_profile_holdout
+    together making up the same response as `/recommend`.  If something fails after the
+    stream has started, the last message is {"type": "error", "detail": ...}.
+    """
+    try:
+        req, model, profile = await _preprocess_recommend_request(request)
+        corpus_indices, normalized_ratings, original_ratings, norm_stats = profile
+
+        cache_key = _cache.make_key(req, corpus_indices, original_ratings)
+        cached_body = _cache.get(cache_key)
+        if cached_body is not None:
+            return StreamingResponse(
+                iter(_stream_cached_response(cached_body)),
+                media_type=NDJSON_CONTENT_TYPE,
+            )
+
+        return StreamingResponse(
+            _stream_response(
+                model,
+                req,
+                cache_key,
+                corpus_indices,
+                normalized_ratings,
+                original_ratings,
+                norm_stats,
+            ),
+            media_type=NDJSON_CONTENT_TYPE,
+        )
+
+    except (HTTPException, RequestValidationError):
+        raise
+    except Exception as e:
+        logger.exception("Error processing streaming recommendation request")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def _preprocess_profiles(
+    model: RecommenderModel, profiles: list[list[ProfileEntry]]
+) -> list[tuple | str]:
+    """Preprocess every profile, returning an error message for invalid ones."""
+    entries = [entry for profile in profiles for entry in profile]
+    offsets = np.zeros(len(profiles) + 1, dtype=np.int64)
+    np.cumsum([len(profile) for profile in profiles], out=offsets[1:])
+    results = preprocess_profile_batch(
+        model,
+        np.array([entry.anime_id for entry in entries], dtype=np.int64),
+        np.array([entry.rating for entry in entries], dtype=np.float32),
+        encode_watch_statuses([entry.watch_status for entry in entries]),
+        offsets,
+    )
+    return [
+        (
+            "profile must be a non-empty list"
+            if not profile
+            else "No valid entries in user profile" if result is None else result
+        )
+        for profile, result in zip(profiles, results)
+    ]
+
+
+async def _compute_batch_responses(
+    model: RecommenderModel,
+    req: RecommendBatchRequest,
+    profiles: list[tuple],
+) -> list[bytes]:
+    """Run inference for preprocessed `/recommend/batch` profiles and encode their responses."""
+    if req.include_contribution_analysis or req.include_profile_holdout:
+        # Analysis runs per profile, so each profile is its own job
+        results = await asyncio.gather(
+            *(
+                _compute_response(
+                    model, req, corpus_indices, normalized_ratings, original_ratings
+                )
+                for corpus_indices, normalized_ratings, original_ratings, _ in profiles
+            )
+        )
+        return [
+            encode_response(recommendations, profile_holdout, norm_stats)
+            for (recommendations, profile_holdout), (*_, norm_stats) in zip(
+                results, profiles
+            )
+        ]
+
+    logit_weight = (
+        CONF["rec_logit_weight"] if req.logit_weight is None else req.logit_weight
+    )
+    excluded_mask = build_exclusion_mask(
+        model,
+        req.excluded_anime_ids,
+        req.excluded_genre_ids,
+        req.excluded_media_types,
+        req.included_media_types,
+    )
+    jobs = [
+        _BatchedRecommendJob(
+            corpus_indices=corpus_indices,
+            normalized_ratings=normalized_ratings,
+            top_k=req.top_k,
+            logit_weight=logit_weight,
+            use_alt_ranking=req.use_alt_ranking,
+            niche_boost_factor=req.niche_boost_factor,
+            excluded_mask=(
+                exclude_profile_franchises(
+                    model, excluded_mask, corpus_indices, req.franchise_seed_anime_ids
+                )
+                if req.collapse_franchises
+                else excluded_mask
+            ),
+            collapse_franchises=req.collapse_franchises,
+            future=None,
+        )
+        for corpus_indices, normalized_ratings, *_ in profiles
+    ]
+    # Group profiles of similar length so each chunk needs little padding
+    order = sorted(range(len(jobs)), key=lambda i: len(jobs[i].corpus_indices))
+    chunks = [
+        order[start : start + _RECOMMEND_BATCH_CHUNK_SIZE]
+        for start in range(0, len(order), _RECOMMEND_BATCH_CHUNK_SIZE)
+    ]
+    chunk_results = await asyncio.gather(
+        *(
+            _lanes.run(
+                _run_batched_recommendations,
+                [jobs[i] for i in chunk],
+                # One row per profile; large chunks count as heavy and stay off the
+                # lane kept for interactive requests
+                cost=len(chunk),
+            )
+            for chunk in chunks
+        )
+    )
+
+    recommendations = [None] * len(jobs)
+    for chunk, results in zip(chunks, chunk_results):
+        for i, result in zip(chunk, results):
+            recommendations[i] = result
+    return [
+        encode_response(recs, None, norm_stats)
+        for recs, (*_, norm_stats) in zip(recommendations, profiles)
+    ]
+
+
+@app.post("/recommend/batch")
+async def recommend_batch(req: RecommendBatchRequest):
+    """
+    Get recommendations for many user profiles that share the same options.
+
+    Returns {"results": [...]} with one entry per profile, in order.  Each entry is the
+    object `/recommend` would return for that profile, or {"error": ...} if the profile
+    is invalid.  Results are cached per profile, shared with `/recommend`.
+    """
+    if not req.profiles:
+        raise HTTPException(status_code=400, detail="profiles must be a non-empty list")
+    if len(req.profiles) > _RECOMMEND_BATCH_MAX_PROFILES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"at most {_RECOMMEND_BATCH_MAX_PROFILES} profiles per request",
+        )
+
+    try:
+        model = get_model()
+        preprocessed = await asyncio.to_thread(
+            _preprocess_profiles, model, req.profiles
+        )
+
+        bodies: list[bytes | None] = [None] * len(preprocessed)
+        # Uncached profiles by cache key, so duplicates are only computed once
+        pending: dict[bytes, tuple[tuple, list[int]]] = {}
+        for i, result in enumerate(preprocessed):
+            if isinstance(result, str):
+                bodies[i] = encode_json_response({"error": result})
+                continue
+            corpus_indices, _, original_ratings, _ = result
+            cache_key = _cache.make_key(req, corpus_indices, original_ratings)
+            if cache_key in pending:
+                pending[cache_key][1].append(i)
+                continue
+            bodies[i] = _cache.get(cache_key)
+            if bodies[i] is None:
+                pending[cache_key] = (result, [i])
+
+        if pending:
+            start_time = time.perf_counter()
+            responses = await _compute_batch_responses(
+                model, req, [result for result, _ in pending.values()]
+            )
+            # Attribute the batch's latency evenly to its profiles
+            compute_seconds = (time.perf_counter() - start_time) / len(pending)
+            for (cache_key, (_, indices)), body in zip(pending.items(), responses):
+                _cache.put(cache_key, body, compute_seconds)
+                for i in indices:
+                    bodies[i] = body
+
+        return Response(
+            content=b'{"results":[' + b",".join(bodies) + b"]}",
+            media_type="application/json",
+        )
 
     except HTTPException:
         raise
     except Exception as e:
-        logger.exception("Error processing recommendation request")
+        logger.exception("Error processing batch recommendation request")
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -755,19 +3238,144 @@ async def get_corpus():
 async def cache_stats():
     """Return cache statistics."""
     return {
-        "size": len(_cache),
-        "max_size": _cache.max_size,
+        **_cache.stats(),
+        "coalesced_requests": _in_flight.coalesced,
+        "batches_run": _batcher.batches_run,
+        "requests_batched": _batcher.requests_batched,
+        "output_cache": {
+            "size": len(_output_cache),
+            "bytes": _output_cache.nbytes,
+            "max_bytes": _output_cache.max_bytes,
+            "hits": _output_cache.hits,
+            "misses": _output_cache.misses,
+        },
     }
 
 
+@app.get("/holdout/stats")
+async def holdout_stats():
+    """Return per-bucket call and compile counters for CPU holdout prediction."""
+    return {
+        "buckets": get_holdout_bucket_stats(),
+        "compilation_cache": get_compilation_cache_stats(),
+    }
+
+
+@app.get("/lanes/stats")
+async def lanes_stats():
+    """Return the load and number of jobs run on each inference lane."""
+    return {"lanes": _lanes.stats()}
+
+
 @app.post("/cache/clear")
 async def clear_cache():
     """Clear the recommendation cache."""
     _cache.clear()
+    _output_cache.clear()
     logger.info("Cache cleared")
     return {"status": "ok", "message": "Cache cleared"}
 
 
+def _publish_weight_bundle() -> tuple[str, bool]:
+    """
+    Make sure there is a weight bundle for worker processes to map.
+
+    Uses `MODEL_BUNDLE_PATH` if it exists.  Otherwise exports the msgpack checkpoint
+    into POSIX shared memory (/dev/shm), so the weights are loaded once for all workers.
+
+    Returns:
+        (bundle_path, published) where `published` is True if the caller should remove
+        the bundle when done
+    """
+    bundle_path = os.environ.get("MODEL_BUNDLE_PATH")
+    if bundle_path and os.path.exists(bundle_path):
+        return bundle_path, False
+
+    shm_dir = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    bundle_path = os.path.join(shm_dir, f"sprout-model-{os.getpid()}.bin")
+    logger.info(f"Publishing model weights to {bundle_path}")
+    export_weight_bundle(
+        os.environ.get("MODEL_PATH", "/opt/model/jax_model.msgpack"),
+        os.environ.get("CORPUS_PATH", "/opt/model/corpus_ids.json"),
+        bundle_path,
+        os.environ.get("METADATA_PATH"),
+    )
+    os.environ["MODEL_BUNDLE_PATH"] = bundle_path
+    return bundle_path, True
+
+
+def _partition_cpus(num_workers: int) -> list[list[int]]:
+    """Split the CPUs available to this process into contiguous per-worker slices."""
+    cpus = sorted(os.sched_getaffinity(0))
+    if num_workers > len(cpus):
+        logger.warning(
+            f"Running {num_workers} workers on {len(cpus)} CPUs; workers will share cores"
+        )
+        return [[cpus[i % len(cpus)]] for i in range(num_workers)]
+    return [chunk.tolist() for chunk in np.array_split(np.array(cpus), num_workers)]
+
+
+def _run_worker(config: "uvicorn.Config", sockets: list[socket.socket]) -> None:
+    import uvicorn
+
+    uvicorn.Server(config).run(sockets=sockets)
+
+
+def serve_workers(num_workers: int, host: str, port: int) -> None:
+    """
+    Serve the app from several worker processes that share one copy of the weights.
+
+    The model weights are published once as a weight bundle that every worker maps
+    read-only (see `load_model_from_bundle`), so the params live in shared page cache
+    rather than in each worker's private memory.  Each worker is pinned to its own
+    slice of cores and runs JAX on a single CPU device, since replicating params across
+    devices would copy them.
+    """
+    import uvicorn
+
+    bundle_path, published = _publish_weight_bundle()
+    config = uvicorn.Config(
+        "model_server:app", host=host, port=port, timeout_keep_alive=120
+    )
+    sock = config.bind_socket()
+
+    # Spawn rather than fork: JAX is not fork-safe once imported
+    context = multiprocessing.get_context("spawn")
+    processes = []
+
+    def terminate_workers(*_):
+        for process in processes:
+            process.terminate()
+
+    signal.signal(signal.SIGINT, terminate_workers)
+    signal.signal(signal.SIGTERM, terminate_workers)
+
+    try:
+        for worker_index, worker_cpus in enumerate(_partition_cpus(num_workers)):
+            # Spawned processes inherit the environment at start time
+            os.environ["INFERENCE_WORKER_CPUS"] = ",".join(map(str, worker_cpus))
+            os.environ["NUM_CPU_DEVICES"] = "1"
+            if _RESPONSE_CACHE_SNAPSHOT_PATH:
+                # Each worker has its own response cache
+                os.environ["RESPONSE_CACHE_SNAPSHOT_PATH"] = (
+                    f"{_RESPONSE_CACHE_SNAPSHOT_PATH}.{worker_index}"
+                )
+            process = context.Process(target=_run_worker, args=(config, [sock]))
+            process.start()
+            processes.append(process)
+            logger.info(f"Started worker {process.pid} on CPUs {worker_cpus}")
+
+        for process in processes:
+            process.join()
+    finally:
+        terminate_workers()
+        for process in processes:
+            process.join()
+        sock.close()
+        if published:
+            os.unlink(bundle_path)
+
+
 if __name__ == "__main__":
     import argparse
     import uvicorn
@@ -778,18 +3386,35 @@ if __name__ == "__main__":
     parser.add_argument(
         "--model-path",
         type=str,
-        default="../data/jax_model.msgpack",
+        default=os.environ.get("MODEL_PATH", "../data/jax_model.msgpack"),
         help="Path to model file",
     )
     parser.add_argument(
         "--corpus-path",
         type=str,
-        default="../data/corpus_ids.json",
+        default=os.environ.get("CORPUS_PATH", "../data/corpus_ids.json"),
         help="Path to corpus IDs file",
     )
+    parser.add_argument(
+        "--bundle-path",
+        type=str,
+        default=os.environ.get("MODEL_BUNDLE_PATH"),
+        help="Path to a weight bundle; takes precedence over --model-path and --corpus-path",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=int(os.environ.get("INFERENCE_WORKERS", "1")),
+        help="Number of worker processes; workers share weights and split the CPUs",
+    )
     args = parser.parse_args()
 
     os.environ["MODEL_PATH"] = args.model_path
     os.environ["CORPUS_PATH"] = args.corpus_path
+    if args.bundle_path:
+        os.environ["MODEL_BUNDLE_PATH"] = args.bundle_path
 
-    uvicorn.run(app, host=args.host, port=args.port)
+    if args.workers > 1:
+        serve_workers(args.workers, args.host, args.port)
+    else:
+        uvicorn.run(app, host=args.host, port=args.port)
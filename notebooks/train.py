@@ -16,6 +16,8 @@ from model import (
     infer_outputs,
     rank_by_weighted_score,
     compute_holdout_metrics,
+    setup_compilation_cache,
+    get_compilation_cache_stats,
 )
 
 EVAL_PROFILE_SEED = 2222
@@ -474,7 +476,17 @@ def load_all_users(file_path="../data/user_input_vectors.npz"):
     return all_users
 
 
+def print_compilation_cache_stats(label: str):
+    cache_stats = get_compilation_cache_stats()
+    print(
+        f"  [Compilation cache after {label}]: "
+        f"{cache_stats['hits']} hits, {cache_stats['misses']} misses"
+    )
+
+
 def main(steps=50_000):
+    setup_compilation_cache()
+
     rng = random.PRNGKey(0)
     state = create_train_state(rng, CONF["learning_rate"])
 
@@ -533,6 +545,9 @@ def main(steps=50_000):
                 f"log_var_presence: {state.params['log_var_presence'][0]:.4f}; log_var_rating: {state.params['log_var_rating'][0]:.4f}"
             )
 
+            if step == 0:
+                print_compilation_cache_stats("first train step")
+
             if lr_scale < 1e-6:
                 print("Learning rate scale has decayed below 1e-6, stopping training.")
                 break
@@ -548,6 +563,8 @@ def main(steps=50_000):
                 f"  [Validation @ step {step}]: "
                 f"(Presence: {val_presence:.4f}, Rating: {val_rating:.4f})"
             )
+            if step == 1000:
+                print_compilation_cache_stats("first validation step")
 
         if step % 5000 == 0 and step > 0:
             item_logits, rating_pred = infer_outputs(
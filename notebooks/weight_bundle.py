@@ -0,0 +1,316 @@
+"""
+Flat, memory-mappable bundle of model weights, corpus IDs and popularity distribution.
+
+Loading `jax_model.msgpack` requires running `Recommender().init` to build a template
+tree and then reading the whole file into memory to deserialize it.  A bundle is
+instead laid out so that every array can be viewed directly out of a read-only
+`np.memmap` of the file:
+
+    bytes 0-7     magic b"SPROUTWB"
+    bytes 8-15    little-endian uint64 header length
+    header        UTF-8 JSON: format version, corpus IDs, and for each array its
+                  name, dtype, shape and byte offset from the start of the data section
+    data          starts at the first 64-byte boundary after the header; raw
+                  little-endian C-order arrays, each starting on a 64-byte boundary
+
+Param arrays are named by their path in the param tree joined with "/", e.g.
+"Dense_0/kernel".  The popularity distribution, if present, is stored under
+"popularity_distribution".
+
+Export with: python weight_bundle.py --output ../data/model_bundle.bin
+"""
+
+import csv
+import hashlib
+import json
+import logging
+import os
+import struct
+from dataclasses import dataclass
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+BUNDLE_MAGIC = b"SPROUTWB"
+BUNDLE_VERSION = 1
+# XLA's CPU client can only alias host buffers that are 64-byte aligned
+BUNDLE_ALIGNMENT = 64
+POPULARITY_ARRAY_NAME = "popularity_distribution"
+
+_PREAMBLE = struct.Struct("<8sQ")
+
+
+@dataclass
+class WeightBundle:
+    """Contents of a weight bundle.  Arrays are read-only views into the mapping."""
+
+    params: dict
+    corpus_ids: list[int]
+    popularity_distribution: np.ndarray | None
+    mapping: np.memmap
+
+
+def _align(offset: int) -> int:
+    return (offset + BUNDLE_ALIGNMENT - 1) // BUNDLE_ALIGNMENT * BUNDLE_ALIGNMENT
+
+
+def flatten_params(params: dict, prefix: str = "") -> dict[str, np.ndarray]:
+    """Flatten a nested param tree into {"Dense_0/kernel": array, ...}."""
+    flat = {}
+    for key in sorted(params):
+        path = f"{prefix}{key}"
+        value = params[key]
+        if isinstance(value, dict):
+            flat.update(flatten_params(value, prefix=f"{path}/"))
+        else:
+            flat[path] = np.asarray(value)
+    return flat
+
+
+def unflatten_params(flat: dict[str, np.ndarray]) -> dict:
+    """Inverse of `flatten_params`."""
+    params = {}
+    for path, value in flat.items():
+        *parents, leaf = path.split("/")
+        node = params
+        for key in parents:
+            node = node.setdefault(key, {})
+        node[leaf] = value
+    return params
+
+
+def compute_weights_checksum(
+    params: dict,
+    corpus_ids: list[int],
+    popularity_distribution: np.ndarray | None = None,
+) -> bytes:
+    """
+    Digest of everything that determines the model's outputs.
+
+    Equal for a msgpack checkpoint and a bundle exported from it, so it can be used to
+    tell whether state derived from one model (e.g. cached responses) is valid for another.
+
+    Returns:
+        16-byte blake2b digest
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    arrays = flatten_params(params)
+    if popularity_distribution is not None:
+        arrays[POPULARITY_ARRAY_NAME] = popularity_distribution
+    for name in sorted(arrays):
+        value = np.ascontiguousarray(
+            arrays[name], dtype=arrays[name].dtype.newbyteorder("<")
+        )
+        digest.update(
+            json.dumps([name, value.dtype.str, list(value.shape)]).encode("utf-8")
+        )
+        digest.update(value.reshape(-1).view(np.uint8))
+    digest.update(np.asarray(corpus_ids, dtype="<i8").tobytes())
+    return digest.digest()
+
+
+def compute_popularity_distribution(
+    metadata_path: str, corpus_ids: list[int]
+) -> np.ndarray | None:
+    """
+    Build the normalized popularity distribution over the corpus from the metadata CSV.
+
+    Args:
+        metadata_path: Path to processed-metadata.csv
+        corpus_ids: Anime ID for each corpus index
+
+    Returns:
+        (corpus_size,) float32 array of rating counts normalized to sum to 1.0, or
+        None if no corpus item has a rating count
+    """
+    logger.info(f"Loading metadata from {metadata_path}")
+
+    # Map anime_id to rating_count
+    anime_id_to_rating_count = {}
+    with open(metadata_path, "r", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            anime_id = int(row["id"])
+            rating_count = int(row["rating_count"])
+            anime_id_to_rating_count[anime_id] = rating_count
+
+    # Build popularity array for corpus items
+    rating_counts = np.zeros(len(corpus_ids), dtype=np.float32)
+    for idx, anime_id in enumerate(corpus_ids):
+        if anime_id in anime_id_to_rating_count:
+            rating_counts[idx] = anime_id_to_rating_count[anime_id]
+        else:
+            logger.warning(f"No metadata found for anime_id {anime_id} in corpus")
+
+    # Normalize to probability distribution (sum to 1.0)
+    total_rating_count = rating_counts.sum()
+    if total_rating_count <= 0:
+        return None
+    return rating_counts / total_rating_count
+
+
+def write_weight_bundle(
+    path: str,
+    params: dict,
+    corpus_ids: list[int],
+    popularity_distribution: np.ndarray | None = None,
+) -> None:
+    """
+    Write params, corpus IDs and popularity distribution to a bundle file.
+
+    Args:
+        path: Output file path
+        params: Nested param tree of arrays
+        corpus_ids: Anime ID for each corpus index
+        popularity_distribution: Optional (corpus_size,) popularity array
+    """
+    arrays = flatten_params(params)
+    if popularity_distribution is not None:
+        arrays[POPULARITY_ARRAY_NAME] = popularity_distribution
+    arrays = {
+        name: np.ascontiguousarray(
+            value, dtype=np.asarray(value).dtype.newbyteorder("<")
+        )
+        for name, value in arrays.items()
+    }
+
+    entries = []
+    offset = 0
+    for name, value in arrays.items():
+        entries.append(
+            {
+                "name": name,
+                "dtype": value.dtype.str,
+                "shape": list(value.shape),
+                "offset": offset,
+            }
+        )
+        offset = _align(offset + value.nbytes)
+
+    header_bytes = json.dumps(
+        {
+            "version": BUNDLE_VERSION,
+            "corpus_ids": [int(anime_id) for anime_id in corpus_ids],
+            "arrays": entries,
+        }
+    ).encode("utf-8")
+    data_start = _align(_PREAMBLE.size + len(header_bytes))
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_PREAMBLE.pack(BUNDLE_MAGIC, len(header_bytes)))
+        f.write(header_bytes)
+        for entry, value in zip(entries, arrays.values()):
+            f.write(b"\0" * (data_start + entry["offset"] - f.tell()))
+            f.write(value.tobytes())
+    os.replace(tmp_path, path)
+
+
+def read_weight_bundle(path: str) -> WeightBundle:
+    """
+    Map a bundle file and build the param tree as zero-copy views into it.
+
+    Pages are only read from disk as the arrays are touched, and are shared through
+    the page cache with any other process mapping the same file.
+    """
+    mapping = np.memmap(path, dtype=np.uint8, mode="r")
+    magic, header_length = _PREAMBLE.unpack_from(mapping, 0)
+    if magic != BUNDLE_MAGIC:
+        raise ValueError(f"{path} is not a weight bundle")
+    header = json.loads(
+        mapping[_PREAMBLE.size : _PREAMBLE.size + header_length].tobytes()
+    )
+    if header["version"] != BUNDLE_VERSION:
+        raise ValueError(
+            f"{path} has bundle version {header['version']}, expected {BUNDLE_VERSION}"
+        )
+    data_start = _align(_PREAMBLE.size + header_length)
+
+    arrays = {}
+    for entry in header["arrays"]:
+        dtype = np.dtype(entry["dtype"])
+        shape = tuple(entry["shape"])
+        arrays[entry["name"]] = np.frombuffer(
+            mapping,
+            dtype=dtype,
+            count=int(np.prod(shape)),
+            offset=data_start + entry["offset"],
+        ).reshape(shape)
+
+    popularity_distribution = arrays.pop(POPULARITY_ARRAY_NAME, None)
+    return WeightBundle(
+        params=unflatten_params(arrays),
+        corpus_ids=header["corpus_ids"],
+        popularity_distribution=popularity_distribution,
+        mapping=mapping,
+    )
+
+
+def export_weight_bundle(
+    model_path: str,
+    corpus_ids_path: str,
+    output_path: str,
+    metadata_path: str | None = None,
+) -> None:
+    """Convert a msgpack checkpoint, corpus mapping and metadata into a bundle."""
+    from flax import serialization
+
+    with open(corpus_ids_path, "r") as f:
+        corpus_ids = json.load(f)
+
+    # The checkpoint is a plain nested dict of arrays, so no template tree is needed
+    with open(model_path, "rb") as f:
+        params = serialization.msgpack_restore(f.read())
+
+    popularity_distribution = None
+    if metadata_path and os.path.exists(metadata_path):
+        popularity_distribution = compute_popularity_distribution(
+            metadata_path, corpus_ids
+        )
+    else:
+        logger.warning(
+            f"Metadata file not found at {metadata_path}, skipping popularity"
+        )
+
+    write_weight_bundle(output_path, params, corpus_ids, popularity_distribution)
+    logger.info(f"Wrote weight bundle to {output_path}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s - %(message)s")
+
+    parser = argparse.ArgumentParser(
+        description="Export a memory-mappable weight bundle"
+    )
+    parser.add_argument(
+        "--model-path",
+        type=str,
+        default="../data/jax_model.msgpack",
+        help="Path to model file",
+    )
+    parser.add_argument(
+        "--corpus-path",
+        type=str,
+        default="../data/corpus_ids.json",
+        help="Path to corpus IDs file",
+    )
+    parser.add_argument(
+        "--metadata-path",
+        type=str,
+        default="../data/processed-metadata.csv",
+        help="Path to metadata CSV used for the popularity distribution",
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        default="../data/model_bundle.bin",
+        help="Path to write the bundle to",
+    )
+    args = parser.parse_args()
+
+    export_weight_bundle(
+        args.model_path, args.corpus_path, args.output, args.metadata_path
+    )
@@ -27,7 +27,7 @@ const CachedRawEmbeddings: Map<EmbeddingName, RawEmbedding> = new Map();
 const CachedEmbeddings: Map<EmbeddingName, Embedding> = new Map();
 const CachedNeighbors: Map<EmbeddingName, number[][]> = new Map();
 
-// HEADERS: 'id', 'title', 'title_english', 'related_anime', 'recommendations', 'aired_from_year', 'rating_count', 'average_rating', 'media_type', 'rating'
+// HEADERS: 'id', 'title', 'title_english', 'related_anime', 'recommendations', 'aired_from_year', 'rating_count', 'average_rating', 'media_type', 'rating', 'genres'
 const METADATA_FILE_NAME = `${DATA_DIR}/processed-metadata.csv`;
 
 export const loadMetadata = async () => {
@@ -3,7 +3,7 @@ import * as t from 'io-ts';
 
 import { ModelName, ProfileSource, RECOMMENDATION_MODEL_CORPUS_SIZE } from 'src/components/recommendation/conf';
 import { loadEmbedding } from 'src/embedding';
-import { AnimeListStatusCode, AnimeMediaType, AnimeRelationType, getAnimesByID, type AnimeDetails } from 'src/malAPI';
+import { AnimeListStatusCode, AnimeMediaType, getAnimesByID, type AnimeDetails } from 'src/malAPI';
 import { EmbeddingName } from 'src/types';
 import type { Embedding } from 'src/routes/embedding';
 import { fetchUserRankings } from 'src/helpers';
@@ -89,141 +89,6 @@ export const getGenresDB = async (): Promise<Map<number, string>> => {
   return CachedGenresDB;
 };
 
-const MAX_TRAVERSAL_DEPTH = 18;
-
-const buildSeasonRelationshipsByAnimeID = async (
-  animeIDsToCheck: number[],
-  seasonRelationshipsByAnimeID: Map<number, Set<number>> = new Map(),
-  processedAnimeIDs: Set<number> = new Set(),
-  forceRetainedAnimeIDs: Set<number> = new Set(),
-  depth = 0
-): Promise<{ seasonRelationshipsByAnimeID: Map<number, Set<number>>; forceRetainedAnimeIDs: Set<number> }> => {
-  const metadata = await getAnimesByID(animeIDsToCheck, true);
-
-  let nextAnimeIDsToCheck: number[] = [];
-  for (let i = 0; i < metadata.length; i++) {
-    const datum = metadata[i];
-    processedAnimeIDs.add(animeIDsToCheck[i]);
-    if (!datum) {
-      console.warn(`Could not find metadata for anime ${animeIDsToCheck[i]}`);
-      continue;
-    }
-    if (!datum.related_anime) {
-      continue;
-    }
-    // Movies, music, ONAs, OVAs, and specials are handled by separate filters; don't filter them with extra seasons
-    if (
-      datum.media_type === AnimeMediaType.Movie ||
-      datum.media_type === AnimeMediaType.Music ||
-      datum.media_type === AnimeMediaType.ONA ||
-      datum.media_type === AnimeMediaType.OVA ||
-      datum.media_type === AnimeMediaType.Special
-    ) {
-      forceRetainedAnimeIDs.add(datum.id);
-      // Do not continue so that we can continue crawling relationships from this anime, because for some series
-      // the only link between different seasons is ONAs/OVAs/Movies/etc.
-    }
-
-    const extraSeasonIDs = new Set(
-      datum.related_anime
-        .filter((entry) => {
-          switch (entry.relation_type) {
-            case AnimeRelationType.Sequel:
-            case AnimeRelationType.Prequel:
-            case AnimeRelationType.ParentStory:
-            case AnimeRelationType.SideStory:
-            case AnimeRelationType.Other:
-              return true;
-            default:
-              return false;
-          }
-        })
-        .map((entry) => entry.node.id)
-    );
-    seasonRelationshipsByAnimeID.set(datum.id, extraSeasonIDs);
-    for (const extraSeasonID of extraSeasonIDs) {
-      if (!seasonRelationshipsByAnimeID.has(extraSeasonID)) {
-        seasonRelationshipsByAnimeID.set(extraSeasonID, new Set());
-      }
-      seasonRelationshipsByAnimeID.get(extraSeasonID)!.add(datum.id);
-      nextAnimeIDsToCheck.push(extraSeasonID);
-    }
-  }
-
-  nextAnimeIDsToCheck = [...nextAnimeIDsToCheck].filter((id) => !processedAnimeIDs.has(id));
-  if (depth >= MAX_TRAVERSAL_DEPTH || nextAnimeIDsToCheck.length === 0) {
-    return { forceRetainedAnimeIDs, seasonRelationshipsByAnimeID };
-  }
-
-  return buildSeasonRelationshipsByAnimeID(
-    nextAnimeIDsToCheck,
-    seasonRelationshipsByAnimeID,
-    processedAnimeIDs,
-    forceRetainedAnimeIDs,
-    depth + 1
-  );
-};
-
-const getIsExtraSeasonOfRatedAnime = (
-  embedding: Embedding,
-  animeIdToEmbeddingIndex: Map<number, number>,
-  allWatchedAnimeIDs: Set<number>,
-  seasonRelationshipsByAnimeID: Map<number, Set<number>>,
-  animeID: number,
-  checkedIDs: Set<number> = new Set(),
-  depth = 0
-) => {
-  const extraSeasonIDs = seasonRelationshipsByAnimeID.get(animeID);
-  if (!extraSeasonIDs) {
-    return false;
-  }
-
-  const embeddingIx = animeIdToEmbeddingIndex.get(animeID);
-  const metadatum = typeof embeddingIx === 'number' ? embedding[embeddingIx].metadata : null;
-  if (
-    !metadatum ||
-    metadatum.media_type === AnimeMediaType.Movie ||
-    metadatum.media_type === AnimeMediaType.Music ||
-    metadatum.media_type === AnimeMediaType.ONA ||
-    metadatum.media_type === AnimeMediaType.OVA ||
-    metadatum.media_type === AnimeMediaType.Special
-  ) {
-    return false;
-  }
-
-  for (const extraSeasonAnimeID of extraSeasonIDs) {
-    if (allWatchedAnimeIDs.has(extraSeasonAnimeID)) {
-      return true;
-    }
-  }
-
-  if (depth >= MAX_TRAVERSAL_DEPTH) {
-    return false;
-  }
-
-  checkedIDs.add(animeID);
-  for (const extraSeasonAnimeID of extraSeasonIDs) {
-    if (checkedIDs.has(extraSeasonAnimeID)) {
-      continue;
-    }
-
-    const childIsRelated = getIsExtraSeasonOfRatedAnime(
-      embedding,
-      animeIdToEmbeddingIndex,
-      allWatchedAnimeIDs,
-      seasonRelationshipsByAnimeID,
-      extraSeasonAnimeID,
-      checkedIDs,
-      depth + 1
-    );
-    if (childIsRelated) {
-      return true;
-    }
-  }
-
-  return false;
-};
-
 export interface ModelServerInput {
   profile: {
     anime_id: number;
@@ -256,6 +121,35 @@ export interface ModelServerInput {
    * Defaults to 0 (no boost).
    */
   niche_boost_factor?: number;
+  /**
+   * Anime IDs to leave out of the recommendations, on top of the ones in the profile
+   */
+  excluded_anime_ids?: number[];
+  /**
+   * Leave out anime with any of these genres
+   */
+  excluded_genre_ids?: number[];
+  /**
+   * Leave out anime with any of these media types
+   */
+  excluded_media_types?: AnimeMediaType[];
+  /**
+   * If non-empty, leave out anime with any media type not in this list, including ones not in `AnimeMediaType`
+   */
+  included_media_types?: AnimeMediaType[];
+  /**
+   * Only recommend the best-scoring anime of each franchise (group of sequels, prequels, side stories etc.),
+   * and none from franchises that are already in the profile.  Movies, music, ONAs, OVAs, and specials are
+   * left alone.
+   *
+   * Defaults to false.
+   */
+  collapse_franchises?: boolean;
+  /**
+   * Anime whose franchises `collapse_franchises` also leaves out, such as watched anime that aren't in the profile
+   * or aren't in the corpus
+   */
+  franchise_seed_anime_ids?: number[];
 }
 
 export interface ModelServerOutput {
@@ -321,6 +215,11 @@ const performInferrence = async ({
   computeContributions,
   logitWeight,
   nicheBoostFactor,
+  excludedAnimeIDs,
+  excludedGenreIDs,
+  includedMediaTypes,
+  collapseFranchises,
+  franchiseSeedAnimeIDs,
 }: {
   modelName: ModelName;
   profile: CompatAnimeListEntry[];
@@ -328,10 +227,12 @@ const performInferrence = async ({
   computeContributions: boolean;
   logitWeight: number;
   nicheBoostFactor: number;
+  excludedAnimeIDs: number[];
+  excludedGenreIDs: number[];
+  includedMediaTypes: AnimeMediaType[];
+  collapseFranchises: boolean;
+  franchiseSeedAnimeIDs: number[];
 }): Promise<ModelServerOutput> => {
-  // Request extra recommendations to account for filtering later
-  const requestCount = count * 3;
-
   const useAltRanking = false; // TODO: testing
   if (!useAltRanking) {
     // since the original rating system works with presence probabilities after passing them
@@ -347,12 +248,18 @@ const performInferrence = async ({
       rating: entry.list_status.score,
       watch_status: entry.list_status.status,
     })),
-    top_k: requestCount,
+    // Filtering happens on the model server, so every returned recommendation is used
+    top_k: count,
     logit_weight: logitWeight,
     include_profile_holdout: false,
     include_contribution_analysis: computeContributions,
     use_alt_ranking: useAltRanking,
     niche_boost_factor: nicheBoostFactor,
+    excluded_anime_ids: excludedAnimeIDs,
+    excluded_genre_ids: excludedGenreIDs,
+    included_media_types: includedMediaTypes,
+    collapse_franchises: collapseFranchises,
+    franchise_seed_anime_ids: franchiseSeedAnimeIDs,
   };
 
   const response = await fetch(`${MODEL_SERVER_URL}/recommend`, {
@@ -387,8 +294,6 @@ export const getRecommendations = async ({
   logitWeight,
   nicheBoostFactor,
 }: GetRecommendationsArgs): Promise<Either<{ status: number; body: string }, Recommendation[]>> => {
-  const embedding = (await loadEmbedding(EmbeddingName.Model)).slice(0, RECOMMENDATION_MODEL_CORPUS_SIZE);
-
   let profileData: {
     profile: CompatAnimeListEntry[];
     username: string;
@@ -418,22 +323,6 @@ export const getRecommendations = async ({
     console.log(`Excluding ${excludedRankingAnimeIDs.size} rankings`);
   }
 
-  console.log(`Generating recommendations for user ${username} with ${profile.length} profile entries...`);
-  const output = await performInferrence({
-    modelName,
-    profile: profile.filter((entry) => !excludedRankingAnimeIDs.has(entry.node.id)),
-    count,
-    computeContributions,
-    logitWeight,
-    nicheBoostFactor,
-  });
-
-  // Build a map from anime_id to embedding index for filtering
-  const animeIdToEmbeddingIndex = new Map<number, number>();
-  for (let i = 0; i < embedding.length; i++) {
-    animeIdToEmbeddingIndex.set(embedding[i].metadata.id, i);
-  }
-
   // Build valid media types set for filtering
   const validAnimeMediaTypes = new Set<AnimeMediaType>();
   validAnimeMediaTypes.add(AnimeMediaType.TV);
@@ -450,69 +339,41 @@ export const getRecommendations = async ({
     validAnimeMediaTypes.add(AnimeMediaType.Music);
   }
 
-  let seasonRelationshipsByAnimeID: Map<number, Set<number>> | null = null;
-  let excludedFromSeasonRelationshipExclusionAnimeIDs: Set<number> | null = null;
-  if (!includeExtraSeasons) {
-    const ratedAnimeIDs = profile.map((entry) => entry.node.id);
-    const res = await buildSeasonRelationshipsByAnimeID(ratedAnimeIDs);
-    seasonRelationshipsByAnimeID = res.seasonRelationshipsByAnimeID;
-    excludedFromSeasonRelationshipExclusionAnimeIDs = res.forceRetainedAnimeIDs;
-  }
-
-  const embeddingMetadata = excludedGenreIDs.size > 0 ? await getEmbeddingMetadata(embedding) : [];
-
-  const allWatchedAnimeIDs = new Set(
-    profile
-      .filter((entry) => entry.list_status.status !== AnimeListStatusCode.PlanToWatch)
-      .map((entry) => entry.node.id)
-  );
   const planToWatchAnimeIDs = new Set(
     profile
       .filter((entry) => entry.list_status.status === AnimeListStatusCode.PlanToWatch)
       .map((entry) => entry.node.id)
   );
 
-  // Filter recommendations based on media type, genre exclusion, and season relationships
-  const filteredRecommendations = output.recommendations.filter((rec) => {
-    const embeddingIndex = animeIdToEmbeddingIndex.get(rec.anime_id);
-    if (embeddingIndex === undefined) {
-      return false;
-    }
-
-    // Filter out plan to watch items if requested
-    if (filterPlanToWatch && planToWatchAnimeIDs.has(rec.anime_id)) {
-      return false;
-    }
+  // Anime the model server should leave out of the recommendations
+  const excludedAnimeIDs = new Set<number>();
 
-    const datum = embedding[embeddingIndex];
-    const animeMediaType = datum.metadata.media_type;
-    if (animeMediaType && !validAnimeMediaTypes.has(animeMediaType)) {
-      return false;
-    }
-
-    if (excludedGenreIDs.size > 0) {
-      const metadatum = embeddingMetadata[embeddingIndex];
-      if (metadatum && metadatum.genres?.some((genre) => excludedGenreIDs.has(genre.id))) {
-        return false;
-      }
-    }
-
-    if (seasonRelationshipsByAnimeID) {
-      if (!excludedFromSeasonRelationshipExclusionAnimeIDs?.has(datum.metadata.id)) {
-        const isExtraSeason = getIsExtraSeasonOfRatedAnime(
-          embedding,
-          animeIdToEmbeddingIndex,
-          allWatchedAnimeIDs,
-          seasonRelationshipsByAnimeID,
-          datum.metadata.id
-        );
-        if (isExtraSeason) {
-          return false;
-        }
-      }
+  // Filter out plan to watch items if requested
+  if (filterPlanToWatch) {
+    for (const animeID of planToWatchAnimeIDs) {
+      excludedAnimeIDs.add(animeID);
     }
+  }
 
-    return true;
+  console.log(`Generating recommendations for user ${username} with ${profile.length} profile entries...`);
+  const output = await performInferrence({
+    modelName,
+    profile: profile.filter((entry) => !excludedRankingAnimeIDs.has(entry.node.id)),
+    count,
+    computeContributions,
+    logitWeight,
+    nicheBoostFactor,
+    excludedAnimeIDs: [...excludedAnimeIDs],
+    excludedGenreIDs: [...excludedGenreIDs],
+    includedMediaTypes: [...validAnimeMediaTypes],
+    // Extra seasons of watched anime are left out by collapsing franchises on the model server
+    collapseFranchises: !includeExtraSeasons,
+    // Every watched anime counts, including ones left out of the profile above
+    franchiseSeedAnimeIDs: includeExtraSeasons
+      ? []
+      : profile
+          .filter((entry) => entry.list_status.status !== AnimeListStatusCode.PlanToWatch)
+          .map((entry) => entry.node.id),
   });
 
   // Build a map of profile entries by anime ID for contributor sign determination
@@ -523,7 +384,7 @@ export const getRecommendations = async ({
   const userIsNonRater = ratedCount < profile.length * 0.5;
 
   return right(
-    filteredRecommendations.slice(0, count).map((rec) => {
+    output.recommendations.slice(0, count).map((rec) => {
       const reco: Recommendation = { id: rec.anime_id, score: rec.score };
 
       if (rec.top_contributors) {